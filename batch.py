@@ -0,0 +1,65 @@
+import sys
+import argparse
+
+from utils.configs import SURFACE_PRESETS, DEFAULT_SURFACE_PRESET, EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE
+from utils.batch_export import read_manifest, find_cases, export_cases, ORIENTATIONS
+from utils.vtk_tools import quiet_vtk_logging
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render rotation and slice-sweep videos of image/label/prediction cases offscreen."
+        )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="CSV with image, label, pred and name columns")
+    source.add_argument("--folder", help="folder with one case per sub-folder")
+    parser.add_argument("--image-pattern", default="*image*.nii*")
+    parser.add_argument("--label-pattern", default="*label*.nii*")
+    parser.add_argument("--pred-pattern", default="*pred*.nii*")
+    parser.add_argument("-o", "--output", required=True, help="output folder")
+    parser.add_argument("--no-rotation", action="store_true", help="skip the 3D rotation video")
+    parser.add_argument(
+        "--slices", nargs="*", default=[], choices=list(ORIENTATIONS),
+        help="slice-sweep videos to render"
+        )
+    parser.add_argument("--labels", nargs="*", type=int, default=[1, 2, 3, 4, 5])
+    parser.add_argument("--preds", nargs="*", default=["tp", "fp", "fn"], choices=["tp", "fp", "fn"])
+    parser.add_argument("--quality", default=DEFAULT_SURFACE_PRESET, choices=list(SURFACE_PRESETS))
+    parser.add_argument(
+        "--profile", default=DEFAULT_EXPORT_PROFILE, choices=list(EXPORT_PROFILES),
+        help="video size, frame count, frame rate and codec"
+        )
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument(
+        "--segments", type=int, default=None,
+        help="split each video into this many parts encoded in parallel (default: enough to use every worker)"
+        )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    quiet_vtk_logging()
+    if args.manifest:
+        cases = read_manifest(args.manifest)
+    else:
+        cases = find_cases(args.folder, args.image_pattern, args.label_pattern, args.pred_pattern)
+    if not cases:
+        print("No cases found.")
+        return 1
+
+    options = {
+        "rotation": not args.no_rotation,
+        "slices": args.slices,
+        "labels": args.labels,
+        "preds": args.preds,
+        "preset": args.quality,
+        "profile": args.profile,
+    }
+    failed = export_cases(cases, args.output, options, args.workers, args.segments)
+    print(f"{len(cases) - len(failed)}/{len(cases)} cases exported.")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
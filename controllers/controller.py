@@ -1,6 +1,6 @@
 import vtk
 from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
-from PySide6.QtWidgets import QMainWindow, QVBoxLayout
+from PySide6.QtWidgets import QMainWindow, QVBoxLayout, QProgressBar, QPushButton
 
 from controllers.render_controller import RenderController
 from controllers.slice_viewer_controller import SliceViewerController
@@ -8,8 +8,10 @@ from controllers.multi_slice_viewer_controller import *
 from controllers.mesh_controller import MeshViewerController
 from windows.colors_settings_dialog import ColorsSettingsDialog
 from windows.ui_window_v2 import Ui_MainWindow
+from windows.render_stack import RenderStack
 from utils.vtk_tools import *
 from utils.configs import *
+from utils.load_service import get_load_service
 
 class MainWindowController(QMainWindow):
     def __init__(self):
@@ -25,11 +27,14 @@ class MainWindowController(QMainWindow):
 
         self.settings_action = self.ui.settings_menu.addAction("Color Settings")
         self.settings_action.triggered.connect(self.open_color_settings)
+        self.init_load_status()
 
         self.render_layout = QVBoxLayout(self.ui.render)
         self.render_layout.setContentsMargins(0, 0, 0, 0)
         self.vtk_widget = QVTKRenderWindowInteractor(self.ui.render)
-        self.render_layout.addWidget(self.vtk_widget)  # Add the VTK widget to the layout
+        # Pre-rendered frames of the 3D view are shown in front of the VTK widget
+        self.render_stack = RenderStack(self.vtk_widget, self.ui.render)
+        self.render_layout.addWidget(self.render_stack)
 
         self.vtk_renderer = vtk.vtkRenderer()
         self.vtk_renderer.SetBackground(self.colors["BACKGROUND_COLORS"])
@@ -42,7 +47,8 @@ class MainWindowController(QMainWindow):
             self.rw,
             self.vtk_renderer,
             self.vtk_render_window,
-            self.colors
+            self.colors,
+            self.render_stack
             )
         self.svwController = SliceViewerController(
             self.svw,
@@ -63,7 +69,42 @@ class MainWindowController(QMainWindow):
         self.mvController = MeshViewerController(
             self.mv
         )
+
+        self.ui.vtk_window_tabWidget.currentChanged.connect(self.vtk_panel_changed)
         
+    def init_load_status(self):
+        self.load_service = get_load_service()
+        self.load_progressBar = QProgressBar()
+        self.load_progressBar.setRange(0, 100)
+        self.load_progressBar.setFixedWidth(200)
+        self.load_cancel_btn = QPushButton("Cancel")
+        self.load_cancel_btn.clicked.connect(self.load_service.cancel_all)
+        self.statusBar().addPermanentWidget(self.load_progressBar)
+        self.statusBar().addPermanentWidget(self.load_cancel_btn)
+        self.load_progressBar.hide()
+        self.load_cancel_btn.hide()
+
+        self.load_service.progress.connect(self.update_load_progress)
+        self.load_service.active_changed.connect(self.update_load_status)
+
+    def update_load_progress(self, name, percent):
+        self.load_progressBar.setValue(percent)
+        self.statusBar().showMessage(f"{name} ...")
+
+    def update_load_status(self, active):
+        self.load_progressBar.setVisible(active > 0)
+        self.load_cancel_btn.setVisible(active > 0)
+        if active == 0:
+            self.load_progressBar.setValue(0)
+            self.statusBar().clearMessage()
+
+    def vtk_panel_changed(self, index):
+        # Both panels draw into the shared view: the turntable only belongs to
+        # the 3D one, and surfaces still being extracted would be added back
+        # over the slice viewer's actors
+        self.rw.turntable_checkBox.setChecked(False)
+        self.rwController.cancel_surface_jobs()
+
     def open_color_settings(self):
         dialog = ColorsSettingsDialog(self.colors, DEFAULT_COLORS)
         dialog.color_updated.connect(self.update_colors)
@@ -1,4 +1,3 @@
-import SimpleITK as sitk
 from PySide6.QtCore import QThread, Signal, QObject
 from PySide6.QtWidgets import (
     QMainWindow, QFileDialog
@@ -8,19 +7,21 @@ from windows.multi_slice_viewer_window import *
 from windows.message_box import show_error_message
 from utils.slice_viewer_util import MultiImgSliceViewer, OmnidirectionalSliceViewer
 from utils.vtk_tools import *
+from utils.load_service import get_load_service, LoadCancelled
 
 class RenderWorker(QObject):
     finished = Signal()
-    data_ready = Signal(list, list, dict)
+    data_ready = Signal(list, list, list, dict)
 
-    def __init__(self, image_list, label_list, colors):
+    def __init__(self, image_list, label_list, title_list, colors):
         super().__init__()
         self.image_list = image_list
         self.label_list = label_list
+        self.title_list = title_list
         self.colors = colors
 
     def process(self):
-        self.data_ready.emit(self.image_list, self.label_list, self.colors)
+        self.data_ready.emit(self.image_list, self.label_list, self.title_list, self.colors)
         self.finished.emit()
 
 class MultiSliceViewerController(QMainWindow):
@@ -34,6 +35,7 @@ class MultiSliceViewerController(QMainWindow):
         self.colors = colors
         self.image_data = [None] * 4
         self.pred_data = [None] * 4
+        self.load_service = get_load_service()
         self.threads = []
         self.workers = []
         self.viewers = []
@@ -65,29 +67,44 @@ class MultiSliceViewerController(QMainWindow):
         lineEdit = getattr(self.msvw, f'viewer_data{idx}_lineEdit')                
         data_file_path = lineEdit.text()
         file_exists = check_files(data_file_path)
+        pred_lineEdit = getattr(self.msvw, f'viewer_pred{idx}_lineEdit')
+        pred_lineEdit.setText("")
+        self.load_service.cancel(f"msvw.pred{idx}", notify=False)
+        self.image_data[idx-1] = None
+        self.pred_data[idx-1] = None
+        self.update_render_button()
         if file_exists:
-            pred_btn = getattr(self.msvw, f'viewer_pred{idx}_btn')
-            pred_btn.setEnabled(True)
-            pred_lineEdit = getattr(self.msvw, f'viewer_pred{idx}_lineEdit')
-            pred_lineEdit.setText("")
-            pred_lineEdit.setEnabled(True)
-            self.pred_data[idx-1] = None
-
-            img = sitk.ReadImage(data_file_path)
-            self.image_data[idx-1] = sitk.GetArrayFromImage(img)
-            self.update_render_button()
+            self.load_service.load(
+                f"msvw.data{idx}", data_file_path, load_normalized,
+                lambda data, idx=idx: self.data_loaded(idx, data),
+                lambda error, idx=idx: self.data_load_failed(idx, error)
+                )
             return
         elif data_file_path and not file_exists:
             show_error_message(f"File does not exist: {data_file_path}")
 
+        self.load_service.cancel(f"msvw.data{idx}", notify=False)
+        self.reset_pred_widgets(idx)
+
+    def data_loaded(self, idx, data):
+        pred_btn = getattr(self.msvw, f'viewer_pred{idx}_btn')
+        pred_btn.setEnabled(True)
+        pred_lineEdit = getattr(self.msvw, f'viewer_pred{idx}_lineEdit')
+        pred_lineEdit.setEnabled(True)
+        self.image_data[idx-1] = data
+        self.update_render_button()
+
+    def data_load_failed(self, idx, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_pred_widgets(idx)
+
+    def reset_pred_widgets(self, idx):
         pred_btn = getattr(self.msvw, f'viewer_pred{idx}_btn')
         pred_btn.setEnabled(False)
         pred_lineEdit = getattr(self.msvw, f'viewer_pred{idx}_lineEdit')
         pred_lineEdit.setEnabled(False)
         pred_lineEdit.setText("")
-        self.image_data[idx-1] = None
-        self.pred_data[idx-1] = None
-        self.update_render_button()
 
     def open_pred_data(self, idx):
         data_file_path, _ = QFileDialog.getOpenFileName(self,"Select NII files", "", "NII Files (*.nii *.nii.gz)")
@@ -100,13 +117,24 @@ class MultiSliceViewerController(QMainWindow):
         lineEdit = getattr(self.msvw, f'viewer_pred{idx}_lineEdit')                
         data_file_path = lineEdit.text()
         file_exists = check_files(data_file_path)
+        self.pred_data[idx-1] = None
         if file_exists:
-            img = sitk.ReadImage(data_file_path)
-            self.pred_data[idx-1] = sitk.GetArrayFromImage(img)
+            self.load_service.load(
+                f"msvw.pred{idx}", data_file_path, load_array,
+                lambda data, idx=idx: self.pred_loaded(idx, data),
+                self.pred_load_failed
+                )
             return
         elif data_file_path and not file_exists:
             show_error_message(f"File does not exist: {data_file_path}")
-        self.pred_data[idx-1] = None
+        self.load_service.cancel(f"msvw.pred{idx}", notify=False)
+
+    def pred_loaded(self, idx, data):
+        self.pred_data[idx-1] = data
+
+    def pred_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
 
     def update_render_button(self):
         for i in range(len(self.image_data)):
@@ -119,13 +147,15 @@ class MultiSliceViewerController(QMainWindow):
     def render(self):
         image_list = []
         label_list = []
+        title_list = []
         for idx, img in enumerate(self.image_data):
             if img is None: continue
             image_list.append(img)
             label_list.append(self.pred_data[idx])
+            title_list.append(os.path.basename(getattr(self.msvw, f'viewer_data{idx+1}_lineEdit').text()))
 
         render_thread = QThread()
-        render_worker = RenderWorker(image_list, label_list, self.colors)
+        render_worker = RenderWorker(image_list, label_list, title_list, self.colors)
 
         render_worker.moveToThread(render_thread)
         render_thread.started.connect(render_worker.process)
@@ -139,8 +169,8 @@ class MultiSliceViewerController(QMainWindow):
 
         render_thread.start()
     
-    def create_viewer(self, image_list, label_list, colors):
-        viewer = MultiImgSliceViewer(image_list, label_list, colors)
+    def create_viewer(self, image_list, label_list, title_list, colors):
+        viewer = MultiImgSliceViewer(image_list, label_list, colors, title_list)
         viewer.show()
         self.viewers.append(viewer)
 
@@ -152,6 +182,8 @@ class MultiSliceViewerController(QMainWindow):
             data_lineEdit.setText("")
             pred_lineEdit = getattr(self.msvw, f'viewer_pred{i}_lineEdit')
             pred_lineEdit.setText("")
+            self.load_service.cancel(f"msvw.data{i}", notify=False)
+            self.load_service.cancel(f"msvw.pred{i}", notify=False)
 
         self.image_data = [None] * 4
         self.pred_data = [None] * 4
@@ -170,6 +202,7 @@ class OmnidirectionalViewerController(QMainWindow):
         self.colors = colors
         self.image_data = None
         self.pred_data = None
+        self.load_service = get_load_service()
         self.threads = []
         self.workers = []
         self.viewers = []
@@ -195,25 +228,38 @@ class OmnidirectionalViewerController(QMainWindow):
     def prepare_data(self):             
         data_file_path = self.ovw.viewer_data_lineEdit.text()
         file_exists = check_files(data_file_path)
+        self.ovw.viewer_pred_lineEdit.setText("")
+        self.load_service.cancel("ovw.pred", notify=False)
+        self.image_data = None
+        self.pred_data = None
+        self.update_render_button()
         if file_exists:
-            self.ovw.viewer_pred_btn.setEnabled(True)
-            self.ovw.viewer_pred_lineEdit.setText("")
-            self.ovw.viewer_pred_lineEdit.setEnabled(True)
-            self.pred_data = None
-
-            img = sitk.ReadImage(data_file_path)
-            self.image_data = sitk.GetArrayFromImage(img)
-            self.update_render_button()
+            self.load_service.load(
+                "ovw.data", data_file_path, load_array,
+                self.data_loaded, self.data_load_failed
+                )
             return
         elif data_file_path and not file_exists:
             show_error_message(f"File does not exist: {data_file_path}")
 
+        self.load_service.cancel("ovw.data", notify=False)
+        self.reset_pred_widgets()
+
+    def data_loaded(self, data):
+        self.ovw.viewer_pred_btn.setEnabled(True)
+        self.ovw.viewer_pred_lineEdit.setEnabled(True)
+        self.image_data = data
+        self.update_render_button()
+
+    def data_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_pred_widgets()
+
+    def reset_pred_widgets(self):
         self.ovw.viewer_pred_btn.setEnabled(False)
         self.ovw.viewer_pred_lineEdit.setEnabled(False)
         self.ovw.viewer_pred_lineEdit.setText("")
-        self.image_data = None
-        self.pred_data = None
-        self.update_render_button()
     
     def open_pred_data(self):
         data_file_path, _ = QFileDialog.getOpenFileName(self,"Select NII files", "", "NII Files (*.nii *.nii.gz)")
@@ -224,13 +270,23 @@ class OmnidirectionalViewerController(QMainWindow):
     def prepare_pred(self):               
         data_file_path = self.ovw.viewer_pred_lineEdit.text()
         file_exists = check_files(data_file_path)
+        self.pred_data = None
         if file_exists:
-            img = sitk.ReadImage(data_file_path)
-            self.pred_data = sitk.GetArrayFromImage(img)
+            self.load_service.load(
+                "ovw.pred", data_file_path, load_array,
+                self.pred_loaded, self.pred_load_failed
+                )
             return
         elif data_file_path and not file_exists:
             show_error_message(f"File does not exist: {data_file_path}")
-        self.pred_data = None
+        self.load_service.cancel("ovw.pred", notify=False)
+
+    def pred_loaded(self, data):
+        self.pred_data = data
+
+    def pred_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
 
     def update_render_button(self):
         if self.image_data is not None :
@@ -268,6 +324,8 @@ class OmnidirectionalViewerController(QMainWindow):
         self.ovw.viewer_pred_btn.setEnabled(False)
         self.ovw.viewer_data_lineEdit.setText("")
         self.ovw.viewer_pred_lineEdit.setText("")
+        self.load_service.cancel("ovw.data", notify=False)
+        self.load_service.cancel("ovw.pred", notify=False)
 
         self.image_data = None
         self.pred_data = None
@@ -1,11 +1,18 @@
 import vtk
-import imageio
-from vtkmodules.util import numpy_support as vtkutil
-from PySide6.QtWidgets import QMainWindow, QFileDialog, QProgressDialog, QApplication
+from PySide6.QtWidgets import QMainWindow, QFileDialog
 
 from windows.render_window import Render_Window
 from windows.message_box import show_error_message
 from utils.vtk_tools import *
+from utils.load_service import get_load_service, LoadCancelled
+from utils.confusion import confusion_cache, CONFUSION_CODES
+from utils.scene_graph import SceneGraph
+from utils.frame_pipeline import FrameEncoder
+from utils.video_export import encode_videos, RotationFrames
+from utils.frame_cache import FrameCache, scene_key
+from utils.turntable import TurntableSprite
+from utils.label_index import label_index_cache
+from utils.configs import INTERACTIVE_UPDATE_RATE, STILL_UPDATE_RATE, EXPORT_PROFILES, VIDEO_EXTENSIONS
 
 class RenderController(QMainWindow):
     def __init__(
@@ -13,13 +20,20 @@ class RenderController(QMainWindow):
             rw: Render_Window,
             vtk_renderer: vtk.vtkRenderer,
             vtk_render_window: vtk.vtkRenderWindow,
-            colors: dict
+            colors: dict,
+            render_stack=None
             ):
         super().__init__()
         self.rw = rw
         self.vtk_renderer = vtk_renderer
         self.vtk_render_window = vtk_render_window
         self.colors = colors
+        self.render_stack = render_stack
+        self.turntable = None
+        self.rotation = None
+        self.load_service = get_load_service()
+        self.scene = SceneGraph(vtk_renderer)
+        self.frame_cache = FrameCache()
         self.init()
         self.init_actor()
         
@@ -27,6 +41,7 @@ class RenderController(QMainWindow):
         self.label_image = None
         self.label_image_vtk = None
         self.pred_image_vtk = None
+        self.confusion = None
 
     def init_actor(self):
         self.brain_actor = None
@@ -37,6 +52,9 @@ class RenderController(QMainWindow):
         self.interactor = self.vtk_render_window.GetInteractor()
         interactor_style = vtk.vtkInteractorStyleTrackballCamera()
         self.interactor.SetInteractorStyle(interactor_style)
+        # Coarse levels of detail are drawn while dragging, full meshes on release
+        self.interactor.SetDesiredUpdateRate(INTERACTIVE_UPDATE_RATE)
+        self.interactor.SetStillUpdateRate(STILL_UPDATE_RATE)
         self.interactor.Initialize()
 
     def init(self):
@@ -48,7 +66,14 @@ class RenderController(QMainWindow):
         self.rw.LO_spinBox.valueChanged.connect(self.set_label_opacity)
         self.rw.PO_spinBox.valueChanged.connect(self.set_pred_opacity)
         self.rw.render_pushButton.clicked.connect(self.render_brain)
+        self.rw.quality_comboBox.currentTextChanged.connect(self.set_quality)
+        self.rw.mode_comboBox.currentTextChanged.connect(self.set_mode)
+        self.rw.threshold_spinBox.valueChanged.connect(self.set_brain_opacity)
         self.rw.save_pushButton.clicked.connect(self.save_mp4)
+        self.rw.turntable_checkBox.toggled.connect(self.set_turntable)
+        self.rw.angle_horizontalSlider.valueChanged.connect(self.show_turntable_angle)
+        if self.render_stack is not None:
+            self.render_stack.image_view.interacted.connect(self.resume_live_view)
 
         self.rw.BF_lineEdit.textDropped.connect(self.update_render_button)
         self.rw.LF_lineEdit.textDropped.connect(self.update_label_button)
@@ -74,22 +99,41 @@ class RenderController(QMainWindow):
 
     def update_render_button(self):
         self.brain_image_vtk = None
+        self.rw.render_pushButton.setEnabled(False)
         file_path = self.rw.BF_lineEdit.text()
         file_exists = check_files(file_path)
         if file_exists:
-            self.brain_image_vtk = load_image(file_path)
-            self.rw.LF_btn.setEnabled(True)
-            self.rw.LF_lineEdit.setEnabled(True)
-            self.rw.render_pushButton.setEnabled(True)
+            self.load_service.load(
+                "rw.brain", file_path, load_image,
+                self.brain_loaded, self.brain_load_failed
+                )
             return
         elif file_path and not file_exists:
             show_error_message(f"File does not exist: {file_path}")
 
+        self.load_service.cancel("rw.brain", notify=False)
+        self.reset_brain_widgets()
+
+    def brain_loaded(self, brain_image_vtk):
+        self.brain_image_vtk = brain_image_vtk
+        self.rw.LF_btn.setEnabled(True)
+        self.rw.LF_lineEdit.setEnabled(True)
+        self.rw.render_pushButton.setEnabled(True)
+
+    def brain_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_brain_widgets()
+
+    def reset_brain_widgets(self):
         self.rw.LF_btn.setEnabled(False)
         self.rw.LF_lineEdit.setEnabled(False)
         self.rw.render_pushButton.setEnabled(False)
         self.rw.BO_spinBox.setEnabled(False)
+        self.rw.threshold_spinBox.setEnabled(False)
         self.rw.save_pushButton.setEnabled(False)
+        self.rw.turntable_checkBox.setChecked(False)
+        self.rw.turntable_checkBox.setEnabled(False)
 
     def update_label_button(self):
         self.label_image_vtk = None
@@ -98,26 +142,39 @@ class RenderController(QMainWindow):
         file_path = self.rw.LF_lineEdit.text()
         file_exists = check_files(file_path)
         if file_exists:
-            self.label_image_vtk = load_image(file_path)
-            self.label_image = vtk_img_to_numpy(self.label_image_vtk)
-            max_label_value = self.label_image.max()
-            for i in range(1, 6):
-                button = getattr(self.rw, f'radioButton_{i}')
-                button.setStyleSheet("")
-                button.setEnabled(False)
-            for i in range(1, min(int(max_label_value) + 1, 6)):
-                r = int(self.colors["MASK_COLORS"][i][0]*255)
-                g = int(self.colors["MASK_COLORS"][i][1]*255)
-                b = int(self.colors["MASK_COLORS"][i][2]*255)
-                button = getattr(self.rw, f'radioButton_{i}')
-                button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
-                button.setEnabled(True)
-            self.rw.PF_btn.setEnabled(True)
-            self.rw.PF_lineEdit.setEnabled(True)
+            self.load_service.load(
+                "rw.label", file_path, load_label,
+                self.label_loaded, self.label_load_failed
+                )
             return
         elif file_path and not file_exists:
             show_error_message(f"File does not exist: {file_path}")
 
+        self.load_service.cancel("rw.label", notify=False)
+        self.reset_label_widgets()
+
+    def label_loaded(self, result):
+        self.label_image_vtk, self.label_image, max_label_value = result
+        for i in range(1, 6):
+            button = getattr(self.rw, f'radioButton_{i}')
+            button.setStyleSheet("")
+            button.setEnabled(False)
+        for i in range(1, min(int(max_label_value) + 1, 6)):
+            r = int(self.colors["MASK_COLORS"][i][0]*255)
+            g = int(self.colors["MASK_COLORS"][i][1]*255)
+            b = int(self.colors["MASK_COLORS"][i][2]*255)
+            button = getattr(self.rw, f'radioButton_{i}')
+            button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
+            button.setEnabled(True)
+        self.rw.PF_btn.setEnabled(True)
+        self.rw.PF_lineEdit.setEnabled(True)
+
+    def label_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_label_widgets()
+
+    def reset_label_widgets(self):
         for i in range(1, 6):
             button = getattr(self.rw, f'radioButton_{i}')
             button.setStyleSheet("")
@@ -126,25 +183,40 @@ class RenderController(QMainWindow):
         self.rw.LO_spinBox.setEnabled(False)
         self.rw.PF_btn.setEnabled(False)
         self.rw.PF_lineEdit.setEnabled(False)
-    
+
     def update_pred_button(self):
         self.pred_image_vtk = None
 
         file_path = self.rw.PF_lineEdit.text()
         file_exists = check_files(file_path)
         if file_exists:
-            self.pred_image_vtk = load_image(file_path)
-            for p in ['tp', 'fp', 'fn']:
-                r = int(self.colors["PRED_COLORS"][p][0]*255)
-                g = int(self.colors["PRED_COLORS"][p][1]*255)
-                b = int(self.colors["PRED_COLORS"][p][2]*255)
-                button = getattr(self.rw, f'radioButton_{p}')
-                button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
-                button.setEnabled(True)
+            self.load_service.load(
+                "rw.pred", file_path, load_image,
+                self.pred_loaded, self.pred_load_failed
+                )
             return
         elif file_path and not file_exists:
             show_error_message(f"File does not exist: {file_path}")
 
+        self.load_service.cancel("rw.pred", notify=False)
+        self.reset_pred_widgets()
+
+    def pred_loaded(self, pred_image_vtk):
+        self.pred_image_vtk = pred_image_vtk
+        for p in ['tp', 'fp', 'fn']:
+            r = int(self.colors["PRED_COLORS"][p][0]*255)
+            g = int(self.colors["PRED_COLORS"][p][1]*255)
+            b = int(self.colors["PRED_COLORS"][p][2]*255)
+            button = getattr(self.rw, f'radioButton_{p}')
+            button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
+            button.setEnabled(True)
+
+    def pred_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_pred_widgets()
+
+    def reset_pred_widgets(self):
         for p in ['tp', 'fp', 'fn']:
             button = getattr(self.rw, f'radioButton_{p}')
             button.setStyleSheet("")
@@ -170,16 +242,36 @@ class RenderController(QMainWindow):
 
     def render_brain(self):
         self.init_actor()
-        self.vtk_renderer.RemoveAllViewProps()
+        self.scene.begin()
+        self.cancel_surface_jobs()
+        preset = self.rw.quality_comboBox.currentText()
+        volume_mode = self.rw.mode_comboBox.currentText() == "volume"
         self.rw.BO_spinBox.setEnabled(True)
-        self.rw.save_pushButton.setEnabled(True)
+        self.rw.threshold_spinBox.setEnabled(volume_mode)
+        # end_export enables it again once a running export is done
+        self.rw.save_pushButton.setEnabled(not self.load_service.is_loading("rw.export"))
+        self.rw.turntable_checkBox.setEnabled(self.render_stack is not None)
 
-        self.brain_actor = setup_actor(
-            self.brain_image_vtk,
-            self.rw.BO_spinBox.value() / 200,
-            self.colors["BRAIN_COLORS"]
-            )
-        self.vtk_renderer.AddActor(self.brain_actor)
+        # Surfaces are extracted on the worker pool, one job per pipeline, and
+        # added to the scene by the *_surfaces_ready slots as each one finishes
+        brain_image_vtk = self.brain_image_vtk
+        if volume_mode:
+            # Ray cast directly, labels and predictions are composited on top
+            self.brain_actor = self.scene.request(
+                brain_image_vtk, "volume",
+                lambda: setup_volume(brain_image_vtk, color=self.colors["BRAIN_COLORS"]),
+                None, None
+                )
+            self.update_volume_opacity()
+        elif self.scene.has(brain_image_vtk, None):
+            self.brain_surface_ready(brain_image_vtk, None, refresh=False)
+        else:
+            self.load_service.submit(
+                "rw.surface.brain", "Extracting brain surface",
+                lambda progress, cancelled: surface_levels(volume_surface(brain_image_vtk, None, preset)),
+                lambda surface: self.brain_surface_ready(brain_image_vtk, surface),
+                self.surface_failed
+                )
 
         if self.label_image is not None:
             self.updata_LO_spinBox()
@@ -190,62 +282,161 @@ class RenderController(QMainWindow):
                     selected_label.append(i)
             if selected_label:
                 self.label_actor = [None] * (max(selected_label) + 1)
-                for l in range(len(selected_label)):
-                    if(check_label(self.label_image, selected_label[l])): continue
-                    self.label_actor[selected_label[l]] = setup_actor(
-                        self.label_image_vtk,
-                        self.rw.LO_spinBox.value() / 100,
-                        self.colors["MASK_COLORS"][selected_label[l]],
-                        selected_label[l]
+                label_image_vtk = self.label_image_vtk
+                built_label = [l for l in selected_label if self.scene.has(label_image_vtk, l)]
+                new_label = [l for l in selected_label if l not in built_label]
+                self.label_surfaces_ready(label_image_vtk, built_label, {}, refresh=False)
+                if new_label:
+                    # Extract all labels that are not in the scene yet in a single pass
+                    self.load_service.submit(
+                        "rw.surface.label", "Extracting label surfaces",
+                        lambda progress, cancelled: {
+                            l: surface_levels(surface) for l, surface in label_surfaces(
+                                label_image_vtk,
+                                [l for l in new_label if label_index_cache.get(label_image_vtk).has(l)],
+                                preset
+                                ).items()
+                            },
+                        lambda surfaces: self.label_surfaces_ready(
+                            label_image_vtk, list(surfaces), surfaces
+                            ),
+                        self.surface_failed
                         )
-                    self.vtk_renderer.AddActor(self.label_actor[selected_label[l]])
-        
-        if self.pred_image_vtk is not None:
+
+        self.confusion = None
+        if self.pred_image_vtk is not None and self.label_image_vtk is not None:
             self.updata_PO_spinBox()
-            if self.rw.radioButton_tp.isChecked():
-                tp = AND(self.label_image_vtk, self.pred_image_vtk)
-                if tp is not None:
-                    self.tp_actor = setup_actor(
-                        tp,
-                        self.rw.PO_spinBox.value() / 100,
-                        self.colors["PRED_COLORS"]['tp']
-                        )
-                    self.vtk_renderer.AddActor(self.tp_actor)
-                    self.rw.PO_spinBox.setEnabled(True)
-            if self.rw.radioButton_fp.isChecked():
-                fp = false_positive(self.label_image_vtk, self.pred_image_vtk)
-                if fp is not None:
-                    self.fp_actor = setup_actor(
-                        fp,
-                        self.rw.PO_spinBox.value()/100,
-                        self.colors["PRED_COLORS"]['fp']
-                        )
-                    self.vtk_renderer.AddActor(self.fp_actor)
-                    self.rw.PO_spinBox.setEnabled(True)
-            if self.rw.radioButton_fn.isChecked():
-                fn = false_negative(self.label_image_vtk, self.pred_image_vtk)
-                if fn is not None:
-                    self.fn_actor = setup_actor(
-                        fn,
-                        self.rw.PO_spinBox.value()/100,
-                        self.colors["PRED_COLORS"]['fn']
-                        )
-                    self.vtk_renderer.AddActor(self.fn_actor)
-                    self.rw.PO_spinBox.setEnabled(True)
-        
-        set_camera(self.vtk_renderer)
+            label_image_vtk, pred_image_vtk = self.label_image_vtk, self.pred_image_vtk
+            selected_pred = [
+                p for p in ['tp', 'fp', 'fn']
+                if getattr(self.rw, f'radioButton_{p}').isChecked()
+                ]
+            confusion = confusion_cache.peek(label_image_vtk, pred_image_vtk)
+            built_code = []
+            if confusion is not None:
+                self.confusion = confusion
+                built_code = [
+                    CONFUSION_CODES[p] for p in selected_pred
+                    if self.scene.has(confusion.vtk_img, CONFUSION_CODES[p])
+                    ]
+                self.pred_surfaces_ready(confusion, selected_pred, {}, built_code, refresh=False)
+            if confusion is None or any(
+                    confusion.has(p) and CONFUSION_CODES[p] not in built_code for p in selected_pred
+                    ):
+                def build(progress, cancelled):
+                    confusion = confusion_cache.get(label_image_vtk, pred_image_vtk)
+                    new_code = [
+                        CONFUSION_CODES[p] for p in selected_pred
+                        if confusion.has(p) and CONFUSION_CODES[p] not in built_code
+                        ]
+                    surfaces = label_surfaces(confusion.vtk_img, new_code, preset) if new_code else {}
+                    return confusion, {code: surface_levels(surface) for code, surface in surfaces.items()}
+                self.load_service.submit(
+                    "rw.surface.pred", "Extracting prediction surfaces",
+                    build,
+                    lambda result: self.pred_surfaces_ready(
+                        result[0], selected_pred, result[1], list(result[1])
+                        ),
+                    self.surface_failed
+                    )
+
+        self.refresh_scene(True)
+
+    def cancel_surface_jobs(self):
+        # Surfaces still being extracted for a previous render are no longer wanted
+        for key in ("rw.surface.brain", "rw.surface.label", "rw.surface.pred"):
+            self.load_service.cancel(key, notify=False)
+
+    def set_quality(self):
+        # Meshes of the previous preset are dropped and the scene is rebuilt with the new one
+        rendered = bool(self.scene.entries)
+        self.cancel_surface_jobs()
+        self.scene.clear()
+        if rendered and self.brain_image_vtk is not None:
+            self.render_brain()
+
+    def set_mode(self):
+        # Both brain representations stay in the scene, switching only toggles visibility
+        if self.scene.entries and self.brain_image_vtk is not None:
+            self.render_brain()
+
+    def brain_surface_ready(self, brain_image_vtk, levels, refresh=True):
+        self.brain_actor = self.scene.request(
+            brain_image_vtk, None,
+            lambda: setup_lod_actor(levels),
+            self.rw.BO_spinBox.value() / 200,
+            self.colors["BRAIN_COLORS"]
+            )
+        if refresh:
+            self.refresh_scene(True)
+
+    def label_surfaces_ready(self, label_image_vtk, labels, surfaces, refresh=True):
+        for l in labels:
+            self.label_actor[l] = self.scene.request(
+                label_image_vtk, l,
+                lambda l=l: setup_lod_actor(surfaces[l]),
+                self.rw.LO_spinBox.value() / 100,
+                self.colors["MASK_COLORS"][l]
+                )
+        if refresh:
+            self.refresh_scene(self.brain_actor is None)
+
+    def pred_surfaces_ready(self, confusion, selected_pred, surfaces, codes, refresh=True):
+        self.confusion = confusion
+        for p in selected_pred:
+            code = CONFUSION_CODES[p]
+            if code not in codes:
+                continue
+            actor = self.scene.request(
+                confusion.vtk_img, code,
+                lambda code=code: setup_lod_actor(surfaces[code]),
+                self.rw.PO_spinBox.value() / 100,
+                self.colors["PRED_COLORS"][p]
+                )
+            setattr(self, f'{p}_actor', actor)
+            self.rw.PO_spinBox.setEnabled(True)
+        if refresh:
+            self.refresh_scene(self.brain_actor is None)
+
+    def surface_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error extracting surface: {error}")
+
+    def refresh_scene(self, reset_camera):
+        self.frame_cache.clear()
+        self.restart_turntable()
+        self.scene.commit([
+            self.brain_image_vtk,
+            self.label_image_vtk,
+            self.confusion.vtk_img if self.confusion is not None else None
+            ])
+        if reset_camera:
+            set_camera(self.vtk_renderer)
         self.vtk_render_window.Render()
     
     def set_brain_opacity(self):
         opacity = self.rw.BO_spinBox.value()
-        self.brain_actor.GetProperty().SetOpacity(opacity / 200)
+        if isinstance(self.brain_actor, vtk.vtkVolume):
+            self.update_volume_opacity()
+        elif self.brain_actor is not None:
+            self.brain_actor.GetProperty().SetOpacity(opacity / 200)
+        self.restart_turntable()
         self.vtk_render_window.Render()
+
+    def update_volume_opacity(self):
+        # Brain opacity is the opacity per voxel at the top of the intensity range
+        set_volume_opacity(
+            self.brain_actor,
+            self.rw.threshold_spinBox.value() / 100,
+            self.rw.BO_spinBox.value() / 1000
+            )
     
     def set_label_opacity(self):
         opacity = self.rw.LO_spinBox.value()
-        for i in range(len(self.label_actor)):
+        for i in range(len(self.label_actor or [])):
             if self.label_actor[i] is not None:
                 self.label_actor[i].GetProperty().SetOpacity(opacity / 100)
+        self.restart_turntable()
         self.vtk_render_window.Render()
 
     def set_pred_opacity(self):
@@ -256,63 +447,114 @@ class RenderController(QMainWindow):
             self.fp_actor.GetProperty().SetOpacity(opacity / 100)
         if self.fn_actor is not None:
             self.fn_actor.GetProperty().SetOpacity(opacity / 100)
+        self.restart_turntable()
+        self.vtk_render_window.Render()
+
+    def set_turntable(self):
+        self.stop_turntable()
+        if self.rw.turntable_checkBox.isChecked():
+            # Pre-rendered at the size of the view so frames are shown unscaled
+            width, height = self.vtk_render_window.GetSize()
+            self.turntable = TurntableSprite(self.vtk_renderer, (max(width, 2), max(height, 2)), parent=self)
+            self.turntable.progress.connect(self.turntable_progress)
+            self.turntable.finished.connect(self.turntable_ready)
+
+    def restart_turntable(self):
+        # The scene changed, so the frames no longer match it
+        if self.turntable is not None:
+            self.set_turntable()
+
+    def stop_turntable(self):
+        if self.turntable is not None:
+            self.turntable.stop()
+            self.turntable.deleteLater()
+            self.turntable = None
+        self.rw.angle_horizontalSlider.setEnabled(False)
+        self.rw.angle_label.setText("")
+        if self.render_stack is not None and self.render_stack.showing_image():
+            self.render_stack.show_live()
+            self.vtk_render_window.Render()
+
+    def turntable_progress(self, count):
+        self.rw.angle_label.setText(f"{count * 100 // self.turntable.frames}%")
+
+    def turntable_ready(self):
+        self.rw.angle_horizontalSlider.setEnabled(True)
+        self.rw.angle_label.setText(f"{self.rw.angle_horizontalSlider.value()}°")
+
+    def show_turntable_angle(self):
+        angle = self.rw.angle_horizontalSlider.value()
+        self.rw.angle_label.setText(f"{angle}°")
+        if self.turntable is not None and self.turntable.is_complete():
+            self.render_stack.show_image(self.turntable.image(angle))
+
+    def resume_live_view(self):
+        # The live camera continues from the frame on screen
+        steps = self.turntable.index(self.rw.angle_horizontalSlider.value()) + 1
+        set_camera(self.vtk_renderer)
+        self.vtk_renderer.GetActiveCamera().Azimuth(steps * 360 / self.turntable.frames)
+        self.render_stack.show_live()
         self.vtk_render_window.Render()
 
     def save_mp4(self):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save MP4 file", "", "MP4 Files (*.mp4)")
+        profile = EXPORT_PROFILES[self.rw.export_comboBox.currentText()]
+        extension = VIDEO_EXTENSIONS[profile["codec"]]
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save video file", "", f"Video Files (*{extension})")
         if file_path:
-            if not file_path.endswith(('.mp4')):
-                file_path = file_path + '.mp4'
-
-            try:
-                self.rw.save_pushButton.setEnabled(False)
-
-                progress_dialog = QProgressDialog("Saving MP4 ... 0%", "Cancel", 0, 360, self)
-                progress_dialog.setWindowTitle("Saving Progress")
-                progress_dialog.setMinimumDuration(0)
-                progress_dialog.show()
-
-                window_to_image_filter = vtk.vtkWindowToImageFilter()
-                window_to_image_filter.SetInput(self.vtk_render_window)
-                window_to_image_filter.SetInputBufferTypeToRGB()
-                window_to_image_filter.ReadFrontBufferOff()
-                window_to_image_filter.SetScale(1)
-
-                self.vtk_render_window.SetOffScreenRendering(1)
-                self.vtk_render_window.SetSize(1920, 1080)
-                set_camera(self.vtk_renderer)
-                self.vtk_render_window.Render()
-                
-                writer = imageio.get_writer(file_path, fps=30, codec="libx264")
-                for i in range(360):
-                    self.vtk_renderer.GetActiveCamera().Azimuth(1)
-                    self.vtk_render_window.Render()
-                    window_to_image_filter.Modified()
-                    window_to_image_filter.Update()
-
-                    image_data = window_to_image_filter.GetOutput()
-                    width, height, _ = image_data.GetDimensions()
-                    frame = vtkutil.vtk_to_numpy(image_data.GetPointData().GetScalars())
-                    frame = frame.reshape(height, width, -1)
-                    frame = frame[::-1]
-
-                    writer.append_data(frame)
-
-                    progress_dialog.setValue(i)
-                    progress_dialog.setLabelText(f"Saving MP4... {int((i + 1) / 360 * 100)}%")
-                    QApplication.processEvents()
-                    if progress_dialog.wasCanceled():
-                        raise Exception("Canceled saving.")
-
-                writer.close()
-                progress_dialog.setValue(360)
-
-            except Exception as e:
-                if os.path.exists(file_path):  
-                    os.remove(file_path)
-                progress_dialog.setValue(360)
-                show_error_message(f"Error saving MP4: {e}")
-
-            finally:
-                self.rw.save_pushButton.setEnabled(True)
-                self.vtk_render_window.SetOffScreenRendering(0)
\ No newline at end of file
+            if not file_path.endswith(extension):
+                file_path = file_path + extension
+            self.rw.save_pushButton.setEnabled(False)
+
+            # Encoded on the worker pool with progress and cancel in the status
+            # bar; the view stays usable and later edits do not reach the video
+            frames = profile["frames"]
+            self.export_key = scene_key(self.vtk_renderer)
+            self.export_cached = self.frame_cache.lookup(self.export_key, profile["size"], frames)
+            if self.export_cached is not None:
+                # Same scene as the last export, only the encoding differs
+                filters = []
+                if tuple(profile["size"]) != self.frame_cache.size:
+                    filters.append(f"scale={profile['size'][0]}:{profile['size'][1]}:flags=area")
+                source = self.frame_cache.frames(self.export_cached)
+                job = lambda progress, cancelled: encode_videos(
+                    [(FrameEncoder.from_profile(file_path, profile, filters=filters), source)],
+                    frames, progress, cancelled
+                    )
+            else:
+                # Frames are kept for re-exports as they are encoded
+                self.rotation = RotationFrames(self.vtk_renderer, profile["size"], frames, parent=self)
+                self.frame_cache.begin(self.export_key, profile["size"])
+                rotation = self.rotation
+                job = lambda progress, cancelled: encode_videos(
+                    [(
+                        FrameEncoder.from_profile(file_path, profile, on_frame=self.frame_cache.store),
+                        rotation.frames(cancelled)
+                    )],
+                    frames, progress, cancelled
+                    )
+            self.load_service.submit(
+                "rw.export", f"Saving {os.path.basename(file_path)}", job,
+                self.video_saved, self.video_failed
+                )
+
+    def video_saved(self, file_paths):
+        if self.export_cached is None:
+            # The frames show the scene as it was when the export started
+            self.frame_cache.finish(self.export_key)
+        self.end_export()
+
+    def video_failed(self, error):
+        if self.export_cached is None:
+            self.frame_cache.clear()
+        self.end_export()
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error saving video: {error}")
+
+    def end_export(self):
+        if self.export_cached is not None:
+            self.frame_cache.release()
+        if self.rotation is not None:
+            self.rotation.stop()
+            self.rotation.deleteLater()
+            self.rotation = None
+        self.rw.save_pushButton.setEnabled(True)
@@ -1,11 +1,16 @@
 import vtk
-import imageio
-from vtkmodules.util import numpy_support as vtkutil
-from PySide6.QtWidgets import QMainWindow, QFileDialog, QProgressDialog, QApplication
+from PySide6.QtWidgets import QMainWindow, QFileDialog, QApplication
 
 from windows.slice_viewer_window import SliceViewer_Window
 from windows.message_box import show_error_message
 from utils.vtk_tools import *
+from utils.load_service import get_load_service, LoadCancelled
+from utils.confusion import confusion_cache, CONFUSION_CODES
+from utils.frame_pipeline import FrameEncoder
+from utils.video_export import encode_videos
+from utils.slice_frames import SliceCompositor, overlay_codes, overlay_table
+from utils.snapshots import export_snapshots, ORIENTATION_NAMES
+from utils.configs import EXPORT_PROFILES, VIDEO_EXTENSIONS
 
 class SliceViewerController(QMainWindow):
     def __init__(
@@ -20,6 +25,7 @@ class SliceViewerController(QMainWindow):
         self.vtk_renderer = vtk_renderer
         self.vtk_render_window = vtk_render_window
         self.colors = colors
+        self.load_service = get_load_service()
         self.init()
         self.init_actor()
         
@@ -27,6 +33,8 @@ class SliceViewerController(QMainWindow):
         self.label_image = None
         self.label_image_vtk = None
         self.pred_image_vtk = None
+        self.overlay_source = None
+        self.overlay_image_vtk = None
 
     def init(self):
         self.svw.BF_btn.clicked.connect(self.open_brain_file) 
@@ -50,10 +58,8 @@ class SliceViewerController(QMainWindow):
     def init_actor(self):
         self.brain_reslice = None
         self.brain_actor = None
-        self.label_actor = None
-        self.tp_actor = None
-        self.fp_actor = None
-        self.fn_actor = None
+        self.overlay_reslice = None
+        self.overlay_actor = None
         self.interactor = self.vtk_render_window.GetInteractor()
         interactor_style = vtk.vtkInteractorStyleRubberBand2D()
         self.interactor.SetInteractorStyle(interactor_style)
@@ -76,18 +82,34 @@ class SliceViewerController(QMainWindow):
 
     def update_render_button(self):
         self.brain_image_vtk = None
+        self.svw.render_pushButton.setEnabled(False)
         file_path = self.svw.BF_lineEdit.text()
         file_exists = check_files(file_path)
         if file_exists:
-            self.brain_image_vtk = load_image(file_path)
-            self.svw.LF_btn.setEnabled(True)
-            self.svw.LF_lineEdit.setEnabled(True)
-            self.svw.slice_comboBox.setEnabled(True)
-            self.svw.render_pushButton.setEnabled(True)
+            self.load_service.load(
+                "svw.brain", file_path, load_image,
+                self.brain_loaded, self.brain_load_failed
+                )
             return
         elif file_path and not file_exists:
             show_error_message(f"File does not exist: {file_path}")
 
+        self.load_service.cancel("svw.brain", notify=False)
+        self.reset_brain_widgets()
+
+    def brain_loaded(self, brain_image_vtk):
+        self.brain_image_vtk = brain_image_vtk
+        self.svw.LF_btn.setEnabled(True)
+        self.svw.LF_lineEdit.setEnabled(True)
+        self.svw.slice_comboBox.setEnabled(True)
+        self.svw.render_pushButton.setEnabled(True)
+
+    def brain_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_brain_widgets()
+
+    def reset_brain_widgets(self):
         self.svw.LF_btn.setEnabled(False)
         self.svw.LF_lineEdit.setEnabled(False)
         self.svw.render_pushButton.setEnabled(False)
@@ -104,26 +126,39 @@ class SliceViewerController(QMainWindow):
         file_path = self.svw.LF_lineEdit.text()
         file_exists = check_files(file_path)
         if file_exists:
-            self.label_image_vtk = load_image(file_path)
-            self.label_image = vtk_img_to_numpy(self.label_image_vtk)
-            max_label_value = self.label_image.max()
-            for i in range(1, 6):
-                button = getattr(self.svw, f'radioButton_{i}')
-                button.setStyleSheet("")
-                button.setEnabled(False)
-            for i in range(1, min(int(max_label_value) + 1, 6)):
-                r = int(self.colors["MASK_COLORS"][i][0]*255)
-                g = int(self.colors["MASK_COLORS"][i][1]*255)
-                b = int(self.colors["MASK_COLORS"][i][2]*255)
-                button = getattr(self.svw, f'radioButton_{i}')
-                button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
-                button.setEnabled(True)
-            self.svw.PF_btn.setEnabled(True)
-            self.svw.PF_lineEdit.setEnabled(True)
+            self.load_service.load(
+                "svw.label", file_path, load_label,
+                self.label_loaded, self.label_load_failed
+                )
             return
         elif file_path and not file_exists:
             show_error_message(f"File does not exist: {file_path}")
 
+        self.load_service.cancel("svw.label", notify=False)
+        self.reset_label_widgets()
+
+    def label_loaded(self, result):
+        self.label_image_vtk, self.label_image, max_label_value = result
+        for i in range(1, 6):
+            button = getattr(self.svw, f'radioButton_{i}')
+            button.setStyleSheet("")
+            button.setEnabled(False)
+        for i in range(1, min(int(max_label_value) + 1, 6)):
+            r = int(self.colors["MASK_COLORS"][i][0]*255)
+            g = int(self.colors["MASK_COLORS"][i][1]*255)
+            b = int(self.colors["MASK_COLORS"][i][2]*255)
+            button = getattr(self.svw, f'radioButton_{i}')
+            button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
+            button.setEnabled(True)
+        self.svw.PF_btn.setEnabled(True)
+        self.svw.PF_lineEdit.setEnabled(True)
+
+    def label_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_label_widgets()
+
+    def reset_label_widgets(self):
         for i in range(1, 6):
             button = getattr(self.svw, f'radioButton_{i}')
             button.setStyleSheet("")
@@ -132,30 +167,45 @@ class SliceViewerController(QMainWindow):
         self.svw.LO_spinBox.setEnabled(False)
         self.svw.PF_btn.setEnabled(False)
         self.svw.PF_lineEdit.setEnabled(False)
-     
+
     def update_pred_button(self):
         self.pred_image_vtk = None
 
         file_path = self.svw.PF_lineEdit.text()
         file_exists = check_files(file_path)
         if file_exists:
-            self.pred_image_vtk = load_image(file_path)
-            for p in ['tp', 'fp', 'fn']:
-                r = int(self.colors["PRED_COLORS"][p][0]*255)
-                g = int(self.colors["PRED_COLORS"][p][1]*255)
-                b = int(self.colors["PRED_COLORS"][p][2]*255)
-                button = getattr(self.svw, f'radioButton_{p}')
-                button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
-                button.setEnabled(True)
+            self.load_service.load(
+                "svw.pred", file_path, load_image,
+                self.pred_loaded, self.pred_load_failed
+                )
             return
         elif file_path and not file_exists:
             show_error_message(f"File does not exist: {file_path}")
 
+        self.load_service.cancel("svw.pred", notify=False)
+        self.reset_pred_widgets()
+
+    def pred_loaded(self, pred_image_vtk):
+        self.pred_image_vtk = pred_image_vtk
+        for p in ['tp', 'fp', 'fn']:
+            r = int(self.colors["PRED_COLORS"][p][0]*255)
+            g = int(self.colors["PRED_COLORS"][p][1]*255)
+            b = int(self.colors["PRED_COLORS"][p][2]*255)
+            button = getattr(self.svw, f'radioButton_{p}')
+            button.setStyleSheet(f"color: rgb({r}, {g}, {b});")
+            button.setEnabled(True)
+
+    def pred_load_failed(self, error):
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error loading file: {error}")
+        self.reset_pred_widgets()
+
+    def reset_pred_widgets(self):
         for p in ['tp', 'fp', 'fn']:
             button = getattr(self.svw, f'radioButton_{p}')
             button.setStyleSheet("")
             button.setEnabled(False)
-    
+
     def updata_LO_spinBox(self):
         for i in range(1, 6):
             radio_button = getattr(self.svw, f'radioButton_{i}')
@@ -177,8 +227,6 @@ class SliceViewerController(QMainWindow):
     def render_brain(self):
         self.init_actor()
         self.vtk_renderer.RemoveAllViewProps()
-        self.svw.saveMP4_pushButton.setEnabled(True)
-        self.svw.savePNG_pushButton.setEnabled(True)
 
         self.orientation = self.svw.slice_comboBox.currentIndex()
         self.dims = self.brain_image_vtk.GetDimensions()
@@ -187,72 +235,96 @@ class SliceViewerController(QMainWindow):
             self.brain_image_vtk, self.orientation
             )
 
-        label_opacity = self.svw.LO_spinBox.value() / 100
-        pred_opacity = self.svw.PO_spinBox.value() / 100
+        self.selected_labels = []
         if self.label_image is not None:
             self.updata_LO_spinBox()
-            self.selected_labels = []
             for i in range(1, 6):
                 radio_button = getattr(self.svw, f'radioButton_{i}')
                 if radio_button.isChecked():
                     self.selected_labels.append(i)
-            if self.selected_labels:
-                self.label_reslice, self.label_actor = setup_label_actor_sv(
-                    self.label_image_vtk,
-                    self.orientation,
-                    self.selected_labels,
-                    self.colors["MASK_COLORS"],
-                    label_opacity,
-                    )
-                self.vtk_renderer.AddActor(self.label_actor)
 
-        if self.pred_image_vtk is not None:
+        self.confusion = None
+        self.selected_preds = []
+        self.load_service.cancel("svw.overlay", notify=False)
+        label_image_vtk, pred_image_vtk = self.label_image_vtk, self.pred_image_vtk
+        checked_preds = []
+        if pred_image_vtk is not None and label_image_vtk is not None:
             self.updata_PO_spinBox()
-            if self.svw.radioButton_tp.isChecked():
-                tp = AND(self.label_image_vtk, self.pred_image_vtk)
-                if tp is not None:
-                    self.tp_reslice, self.tp_actor = setup_label_actor_sv(
-                        tp,
-                        self.orientation,
-                        None,
-                        self.colors["PRED_COLORS"]['tp'],
-                        pred_opacity,
-                    )
-            if self.svw.radioButton_fp.isChecked():
-                fp = false_positive(self.label_image_vtk, self.pred_image_vtk)
-                if fp is not None:
-                    self.fp_reslice, self.fp_actor = setup_label_actor_sv(
-                        fp,
-                        self.orientation,
-                        None,
-                        self.colors["PRED_COLORS"]['fp'],
-                        pred_opacity,
-                    )
-            if self.svw.radioButton_fn.isChecked():
-                fn = false_negative(self.label_image_vtk, self.pred_image_vtk)
-                if fn is not None:
-                    self.fn_reslice, self.fn_actor = setup_label_actor_sv(
-                        fn,
-                        self.orientation,
-                        None,
-                        self.colors["PRED_COLORS"]['fn'],
-                        pred_opacity,
+            checked_preds = [
+                p for p in ['tp', 'fp', 'fn']
+                if getattr(self.svw, f'radioButton_{p}').isChecked()
+                ]
+            self.confusion = confusion_cache.peek(label_image_vtk, pred_image_vtk)
+            if self.confusion is not None:
+                self.selected_preds = [p for p in checked_preds if self.confusion.has(p)]
+
+        pending = bool(checked_preds) and self.confusion is None
+        if not pending and self.overlay_cached():
+            self.setup_overlay()
+        elif pending or self.selected_labels or self.selected_preds:
+            # The confusion map and the overlay codes are built on the worker
+            # pool, the overlay is drawn over the intensities once they are ready
+            labels, known_confusion = list(self.selected_labels), self.confusion
+            def build(progress, cancelled):
+                confusion = known_confusion
+                if confusion is None and checked_preds:
+                    confusion = confusion_cache.get(label_image_vtk, pred_image_vtk)
+                preds = [p for p in checked_preds if confusion.has(p)]
+                codes = overlay_codes(
+                    vtk_img_to_numpy(label_image_vtk), labels,
+                    confusion.codes if confusion is not None else None,
+                    [CONFUSION_CODES[p] for p in preds]
                     )
+                return confusion, preds, codes
+            self.load_service.submit(
+                "svw.overlay", "Building slice overlay", build,
+                lambda result: self.overlay_ready(label_image_vtk, pred_image_vtk, *result),
+                self.overlay_failed
+                )
+        # Saves wait for the overlay, so they match the view
+        building = self.load_service.is_loading("svw.overlay")
+        self.svw.saveMP4_pushButton.setEnabled(not building)
+        self.svw.savePNG_pushButton.setEnabled(not building)
 
         self.init_slice_slider()
         self.vtk_renderer.AddActor(self.brain_actor)
-        if self.label_actor:
-            self.vtk_renderer.AddActor(self.label_actor)
-        if self.tp_actor:
-            self.vtk_renderer.AddActor(self.tp_actor)
-        if self.fp_actor:
-            self.vtk_renderer.AddActor(self.fp_actor)
-        if self.fn_actor:
-            self.vtk_renderer.AddActor(self.fn_actor)
+        if self.overlay_actor:
+            self.vtk_renderer.AddActor(self.overlay_actor)
 
         set_camera_sv(self.vtk_renderer)
         self.vtk_render_window.Render()
 
+    def setup_overlay(self):
+        if self.selected_labels or self.selected_preds:
+            # Labels and TP/FP/FN share one code volume and lookup table, so a
+            # slice change reslices only the intensities and the codes
+            self.overlay_reslice, self.overlay_actor = setup_overlay_actor_sv(
+                self.overlay_image_vtk, self.orientation, create_overlay_lut(*self.overlay_colors())
+                )
+
+    def overlay_ready(self, label_image_vtk, pred_image_vtk, confusion, preds, codes):
+        self.svw.saveMP4_pushButton.setEnabled(True)
+        self.svw.savePNG_pushButton.setEnabled(True)
+        # Dropped if the volumes changed or the view was taken over by the 3D panel
+        if (label_image_vtk is not self.label_image_vtk or pred_image_vtk is not self.pred_image_vtk
+                or self.brain_actor is None or not self.vtk_renderer.HasViewProp(self.brain_actor)):
+            return
+        self.confusion = confusion
+        self.selected_preds = preds
+        self.overlay_image_vtk = numpy_to_vtk_img(codes, label_image_vtk)
+        self.overlay_source = self.overlay_key()
+        self.setup_overlay()
+        if self.overlay_actor:
+            self.move_slice(self.svw.slice_horizontalSlider.value())
+            self.vtk_renderer.AddActor(self.overlay_actor)
+        self.vtk_render_window.Render()
+
+    def overlay_failed(self, error):
+        self.svw.saveMP4_pushButton.setEnabled(True)
+        self.svw.savePNG_pushButton.setEnabled(True)
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error building slice overlay: {error}")
+
     def init_slice_slider(self):
         self.svw.slice_horizontalSlider.setEnabled(True)
         self.svw.slice_horizontalSlider.setMinimum(1)
@@ -269,173 +341,157 @@ class SliceViewerController(QMainWindow):
     def set_slice_value(self):
         slice_index = self.svw.slice_horizontalSlider.value()
         self.svw.slice_idx_label.setText(f"{slice_index}")
+        self.move_slice(slice_index)
+        self.vtk_render_window.Render()
+
+    def move_slice(self, slice_index):
         if self.orientation == 0:
-            self.brain_reslice.SetResliceAxesOrigin(0, 0, slice_index-1)
-            if self.label_actor:
-                self.label_reslice.SetResliceAxesOrigin(0, 0, slice_index-1)
-            if self.tp_actor:
-                self.tp_reslice.SetResliceAxesOrigin(0, 0, slice_index-1)
-            if self.fp_actor:
-                self.fp_reslice.SetResliceAxesOrigin(0, 0, slice_index-1)
-            if self.fn_actor:
-                self.fn_reslice.SetResliceAxesOrigin(0, 0, slice_index-1)
+            origin = (0, 0, slice_index - 1)
         elif self.orientation == 1:
-            self.brain_reslice.SetResliceAxesOrigin(slice_index-1, 0, 0)
-            if self.label_actor:
-                self.label_reslice.SetResliceAxesOrigin(slice_index-1, 0, 0)
-            if self.tp_actor:
-                self.tp_reslice.SetResliceAxesOrigin(slice_index-1, 0, 0)
-            if self.fp_actor:
-                self.fp_reslice.SetResliceAxesOrigin(slice_index-1, 0, 0)
-            if self.fn_actor:
-                self.fn_reslice.SetResliceAxesOrigin(slice_index-1, 0, 0)
+            origin = (slice_index - 1, 0, 0)
         elif self.orientation == 2:
-            self.brain_reslice.SetResliceAxesOrigin(0, slice_index-1, 0)
-            if self.label_actor:
-                self.label_reslice.SetResliceAxesOrigin(0, slice_index-1, 0)
-            if self.tp_actor:
-                self.tp_reslice.SetResliceAxesOrigin(0, slice_index-1, 0)
-            if self.fp_actor:
-                self.fp_reslice.SetResliceAxesOrigin(0, slice_index-1, 0)
-            if self.fn_actor:
-                self.fn_reslice.SetResliceAxesOrigin(0, slice_index-1, 0)
-
-        self.brain_reslice.Update()
-        self.vtk_render_window.Render()
+            origin = (0, slice_index - 1, 0)
+        self.brain_reslice.SetResliceAxesOrigin(origin)
+        if self.overlay_actor:
+            self.overlay_reslice.SetResliceAxesOrigin(origin)
+
+    def overlay_key(self):
+        return (self.label_image_vtk, self.confusion, tuple(self.selected_labels), tuple(self.selected_preds))
+
+    def overlay_cached(self):
+        # The overlay is rebuilt only when the volumes or the selection changed since the last render
+        source = self.overlay_key()
+        return (self.overlay_source is not None and source[2:] == self.overlay_source[2:]
+                and all(a is b for a, b in zip(source[:2], self.overlay_source[:2])))
+
+    def overlay_colors(self):
+        return overlay_table(
+            {l: self.colors["MASK_COLORS"][l] for l in self.selected_labels},
+            self.svw.LO_spinBox.value() / 100,
+            {CONFUSION_CODES[p]: self.colors["PRED_COLORS"][p] for p in self.selected_preds},
+            self.svw.PO_spinBox.value() / 100
+            )
 
     def set_label_opacity(self):
-        opacity = self.svw.LO_spinBox.value() / 100
-        if self.label_actor:
-            lut = create_label_lut(self.colors["MASK_COLORS"], opacity, self.selected_labels)
-            color_mapper = vtk.vtkImageMapToColors()
-            color_mapper.SetLookupTable(lut)
-            color_mapper.SetInputConnection(self.label_reslice.GetOutputPort())
-            color_mapper.SetOutputFormatToRGBA()
-            
-            self.label_actor.GetMapper().SetInputConnection(color_mapper.GetOutputPort())
-            self.vtk_render_window.Render()
+        self.update_overlay_lut()
 
     def set_pred_opacity(self):
-        opacity = self.svw.PO_spinBox.value() / 100
-        if self.tp_actor:
-            lut_tp = create_label_lut(self.colors["PRED_COLORS"]["tp"], opacity, None)
-            color_mapper_tp = vtk.vtkImageMapToColors()
-            color_mapper_tp.SetLookupTable(lut_tp)
-            color_mapper_tp.SetInputConnection(self.tp_reslice.GetOutputPort())
-            color_mapper_tp.SetOutputFormatToRGBA()
-            
-            self.tp_actor.GetMapper().SetInputConnection(color_mapper_tp.GetOutputPort())
-            self.vtk_render_window.Render()
-        if self.fp_actor:
-            lut_fp = create_label_lut(self.colors["PRED_COLORS"]["fp"], opacity, None)
-            color_mapper_fp = vtk.vtkImageMapToColors()
-            color_mapper_fp.SetLookupTable(lut_fp)
-            color_mapper_fp.SetInputConnection(self.fp_reslice.GetOutputPort())
-            color_mapper_fp.SetOutputFormatToRGBA()
-            
-            self.fp_actor.GetMapper().SetInputConnection(color_mapper_fp.GetOutputPort())
-            self.vtk_render_window.Render()
-        if self.fn_actor:
-            lut_fn = create_label_lut(self.colors["PRED_COLORS"]["fn"], opacity, None)
-            color_mapper_fn = vtk.vtkImageMapToColors()
-            color_mapper_fn.SetLookupTable(lut_fn)
-            color_mapper_fn.SetInputConnection(self.fn_reslice.GetOutputPort())
-            color_mapper_fn.SetOutputFormatToRGBA()
-            
-            self.fn_actor.GetMapper().SetInputConnection(color_mapper_fn.GetOutputPort())
+        self.update_overlay_lut()
+
+    def update_overlay_lut(self):
+        if self.overlay_actor:
+            self.overlay_actor.GetMapper().GetInputAlgorithm().SetLookupTable(
+                create_overlay_lut(*self.overlay_colors())
+                )
             self.vtk_render_window.Render()
 
     def save_mp4(self):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save MP4 file", "", "MP4 Files (*.mp4)")
+        profile = EXPORT_PROFILES[self.svw.export_comboBox.currentText()]
+        extension = VIDEO_EXTENSIONS[profile["codec"]]
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save video file", "", f"Video Files (*{extension})")
         if file_path:
-            if not file_path.endswith(('.mp4')):
-                file_path = file_path + '.mp4'
-            try:
-                self.svw.saveMP4_pushButton.setEnabled(False)
-                min_slice = self.svw.slice_horizontalSlider.minimum()
-                max_slice = self.svw.slice_horizontalSlider.maximum()
-
-                progress_dialog = QProgressDialog("Saving MP4 ... 0%", "Cancel", 0, max_slice, self)
-                progress_dialog.setWindowTitle("Saving Progress")
-                progress_dialog.setMinimumDuration(0)
-                progress_dialog.show()
-
-                window_to_image_filter = vtk.vtkWindowToImageFilter()
-                window_to_image_filter.SetInput(self.vtk_render_window)
-                window_to_image_filter.SetInputBufferTypeToRGB()
-                window_to_image_filter.ReadFrontBufferOff()
-                window_to_image_filter.SetScale(1)
-
-                self.vtk_render_window.SetOffScreenRendering(1)
-
-                set_camera_sv(self.vtk_renderer)
-
-                writer = imageio.get_writer(file_path, fps=30, codec="libx264")
-                
-                for slice_idx in range(min_slice, max_slice + 1):
-                    self.svw.slice_horizontalSlider.setValue(slice_idx)
-                    self.set_slice_value()
-                    self.vtk_render_window.Render()
-                    window_to_image_filter.Modified()
-                    window_to_image_filter.Update()
-                    image_data = window_to_image_filter.GetOutput()
-                    width, height, _ = image_data.GetDimensions()
-
-                    frame = vtkutil.vtk_to_numpy(image_data.GetPointData().GetScalars())
-                    frame = frame.reshape(height, width, -1)
-                    frame = frame[::-1]
-                    writer.append_data(frame)
-
-                    progress_dialog.setValue(slice_idx)
-                    progress_dialog.setLabelText(f"Saving MP4... {int((slice_idx + 1) / (max_slice + 1) * 100)}%")
-                    QApplication.processEvents()
-                    if progress_dialog.wasCanceled():
-                        raise Exception("Canceled saving.")
-
-                writer.close()
-                progress_dialog.setValue(max_slice)
-
-            except Exception as e:
-                if os.path.exists(file_path):  
-                    os.remove(file_path)
-                progress_dialog.setValue(max_slice)
-                show_error_message(f"Error saving MP4: {e}")
-
-            finally:
-                self.svw.saveMP4_pushButton.setEnabled(True)
-                self.vtk_render_window.SetOffScreenRendering(0)
+            if not file_path.endswith(extension):
+                file_path = file_path + extension
+            self.svw.saveMP4_pushButton.setEnabled(False)
+
+            # Frames are composited from the volumes on the worker pool, the
+            # view stays usable and is left untouched
+            compositor = self.slice_compositor()
+            filters = compositor.filters(profile["size"], self.vtk_renderer.GetBackground())
+            count = len(compositor)
+            self.load_service.submit(
+                "svw.export", f"Saving {os.path.basename(file_path)}",
+                lambda progress, cancelled: encode_videos(
+                    [(
+                        FrameEncoder.from_profile(file_path, profile, filters=filters),
+                        (compositor.frame(i) for i in range(count))
+                    )],
+                    count, progress, cancelled
+                    ),
+                self.video_saved, self.video_failed
+                )
+
+    def video_saved(self, file_paths):
+        self.svw.saveMP4_pushButton.setEnabled(True)
+
+    def video_failed(self, error):
+        self.svw.saveMP4_pushButton.setEnabled(True)
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error saving video: {error}")
+
+    def slice_compositor(self, orientation=None):
+        # Same volumes, colors and opacities as the rendered view
+        if orientation is None:
+            orientation = self.orientation
+        compositor = SliceCompositor(self.brain_reslice.GetInput(), orientation)
+        if self.overlay_actor:
+            compositor.add_table(self.overlay_reslice.GetInput(), *self.overlay_colors())
+        return compositor
 
     def save_png(self):
         file_path, _ = QFileDialog.getSaveFileName(self, "Save PNG file", "", "PNG Files (*.png)")
         if file_path:
             if not file_path.endswith(('.png')):
                 file_path = file_path + '.png'
-            try:
-                window_to_image_filter = vtk.vtkWindowToImageFilter()
-                window_to_image_filter.SetInput(self.vtk_render_window)
-                window_to_image_filter.SetInputBufferTypeToRGB()
-                window_to_image_filter.ReadFrontBufferOff()
-                window_to_image_filter.SetScale(1)
-
-                self.vtk_render_window.SetOffScreenRendering(1)
-
-                set_camera_sv(self.vtk_renderer)
-
-                self.vtk_render_window.Render()
-                window_to_image_filter.Modified()
-                window_to_image_filter.Update()
-                image_data = window_to_image_filter.GetOutput()
-
-                writer = vtk.vtkPNGWriter()
-                writer.SetFileName(file_path)
-                writer.SetInputData(image_data)
-                writer.Write()
-
-            except Exception as e:
-                if os.path.exists(file_path):  
-                    os.remove(file_path)
-                show_error_message(f"Error saving PNG: {e}")
-
-            finally:
-                self.svw.savePNG_pushButton.setEnabled(True)
-                self.vtk_render_window.SetOffScreenRendering(0)
\ No newline at end of file
+            if self.svw.png_comboBox.currentIndex() == 0:
+                self.save_view_png(file_path)
+            else:
+                self.save_slice_pngs(file_path)
+
+    def save_slice_pngs(self, file_path):
+        # Composited from the volumes like save_mp4, on the worker pool
+        self.svw.savePNG_pushButton.setEnabled(False)
+        orientations = range(3) if self.svw.all_checkBox.isChecked() else [self.orientation]
+        views = []
+        for orientation in orientations:
+            compositor = self.slice_compositor(orientation)
+            indices = range(0, len(compositor), self.svw.step_spinBox.value())
+            views.append((ORIENTATION_NAMES[orientation], indices, compositor.images))
+        sheet = self.svw.png_comboBox.currentIndex() == 2
+        background = [round(c * 255) for c in self.vtk_renderer.GetBackground()]
+        self.load_service.submit(
+            "svw.png", f"Saving {os.path.basename(file_path)}",
+            lambda progress, cancelled: export_snapshots(
+                file_path, views, sheet=sheet, background=background, progress=progress, cancelled=cancelled
+                ),
+            self.pngs_saved, self.pngs_failed
+            )
+
+    def pngs_saved(self, file_paths):
+        self.svw.savePNG_pushButton.setEnabled(True)
+
+    def pngs_failed(self, error):
+        self.svw.savePNG_pushButton.setEnabled(True)
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error saving PNG: {error}")
+
+    def save_view_png(self, file_path):
+        try:
+            window_to_image_filter = vtk.vtkWindowToImageFilter()
+            window_to_image_filter.SetInput(self.vtk_render_window)
+            window_to_image_filter.SetInputBufferTypeToRGB()
+            window_to_image_filter.ReadFrontBufferOff()
+            window_to_image_filter.SetScale(1)
+
+            self.vtk_render_window.SetOffScreenRendering(1)
+
+            set_camera_sv(self.vtk_renderer)
+
+            self.vtk_render_window.Render()
+            window_to_image_filter.Modified()
+            window_to_image_filter.Update()
+            image_data = window_to_image_filter.GetOutput()
+
+            writer = vtk.vtkPNGWriter()
+            writer.SetFileName(file_path)
+            writer.SetInputData(image_data)
+            writer.Write()
+
+        except Exception as e:
+            if os.path.exists(file_path):  
+                os.remove(file_path)
+            show_error_message(f"Error saving PNG: {e}")
+
+        finally:
+            self.svw.savePNG_pushButton.setEnabled(True)
+            self.vtk_render_window.SetOffScreenRendering(0)
\ No newline at end of file
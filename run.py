@@ -1,7 +1,9 @@
 from PySide6 import QtWidgets
 from controllers.controller import MainWindowController
+from utils.vtk_tools import quiet_vtk_logging
 
 if __name__ == '__main__':
+    quiet_vtk_logging()
     app = QtWidgets.QApplication([])
     viewer = MainWindowController()
     viewer.show()
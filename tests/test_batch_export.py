@@ -0,0 +1,18 @@
+import pytest
+
+from utils.batch_export import segment_range
+
+
+def test_single_segment_is_the_whole_video():
+    assert segment_range(360) == range(0, 360)
+
+
+@pytest.mark.parametrize("count, segments", [(360, 4), (90, 7), (5, 8)])
+def test_segments_cover_every_frame_once(count, segments):
+    frames = [i for k in range(segments) for i in segment_range(count, (k, segments))]
+    assert frames == list(range(count))
+
+
+def test_segments_are_balanced():
+    sizes = [len(segment_range(90, (k, 7))) for k in range(7)]
+    assert max(sizes) - min(sizes) <= 1
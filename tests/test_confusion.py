@@ -0,0 +1,22 @@
+import numpy as np
+
+from utils.confusion import confusion_codes, TN, TP, FP, FN
+
+
+def test_confusion_codes():
+    gt = np.array([0, 0, 1, 1, 2, 0], dtype=np.uint8)
+    pred = np.array([0, 1, 0, 1, 3, 0], dtype=np.uint8)
+    codes = confusion_codes(gt, pred)
+    assert codes.dtype == np.uint8
+    np.testing.assert_array_equal(codes, [TN, FP, FN, TP, TP, TN])
+
+
+def test_confusion_codes_of_bool_and_float_volumes():
+    gt = np.zeros((3, 4, 5), dtype=bool)
+    gt[1, 1:3, 1:4] = True
+    pred = np.zeros((3, 4, 5), dtype=np.float32)
+    pred[1, 2:4, 2:5] = 1.0
+    codes = confusion_codes(gt, pred)
+    assert codes.shape == gt.shape
+    expected = np.where(gt, np.where(pred != 0, TP, FN), np.where(pred != 0, FP, TN))
+    np.testing.assert_array_equal(codes, expected)
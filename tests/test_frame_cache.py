@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from utils.frame_cache import FrameCache
+
+
+@pytest.fixture
+def cache():
+    cache = FrameCache()
+    cache.begin("scene", (160, 90))
+    for i in range(12):
+        cache.store(np.full((90, 160, 3), i, dtype=np.uint8))
+    cache.finish("scene")
+    yield cache
+    cache.clear()
+
+
+def test_lookup_full_and_coarser_turns(cache):
+    assert cache.lookup("scene", (160, 90), 12) == list(range(12))
+    assert cache.lookup("scene", (160, 90), 4) == [2, 5, 8, 11]
+    assert cache.lookup("scene", (80, 45), 6) == [1, 3, 5, 7, 9, 11]
+
+
+def test_lookup_misses(cache):
+    assert cache.lookup("other", (160, 90), 12) is None
+    # Larger, other aspect ratio, or a frame count that does not divide the turn
+    assert cache.lookup("scene", (320, 180), 12) is None
+    assert cache.lookup("scene", (90, 90), 12) is None
+    assert cache.lookup("scene", (160, 90), 5) is None
+
+
+def test_lookup_needs_a_finished_export():
+    cache = FrameCache()
+    cache.begin("scene", (160, 90))
+    cache.store(np.zeros((90, 160, 3), dtype=np.uint8))
+    assert cache.lookup("scene", (160, 90), 1) is None
+    cache.finish("changed")
+    assert cache.lookup("scene", (160, 90), 1) is None
+    cache.clear()
+
+
+def test_looked_up_frames_read_back(cache):
+    indices = cache.lookup("scene", (160, 90), 4)
+    frames = list(cache.frames(indices))
+    cache.release()
+    assert [int(frame[0, 0, 0]) for frame in frames] == [2, 5, 8, 11]
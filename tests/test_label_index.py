@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from utils.label_index import LabelIndex
+
+
+def label_volume(dtype=np.uint8):
+    labels = np.zeros((20, 30, 40), dtype=dtype)
+    labels[2:5, 3:7, 4:9] = 1
+    labels[10:12, 20:25, 30:38] = 3
+    return labels
+
+
+def test_boxes_and_extent():
+    index = LabelIndex(label_volume(), brick_size=8)
+    assert set(index.boxes) == {1, 3}
+    assert index.has(1) and index.has(3) and not index.has(2)
+    # VTK order (x0, x1, y0, y1, z0, z1), grown by one voxel
+    assert index.extent([1]) == [3, 9, 2, 7, 1, 5]
+    assert index.extent([1, 3]) == [3, 38, 2, 25, 1, 12]
+    assert index.extent([2]) is None
+
+
+def test_occupied_bricks():
+    index = LabelIndex(label_volume(), brick_size=8)
+    assert index.bricks.shape == (3, 4, 5)
+    assert index.occupied_box() == (slice(0, 16), slice(0, 30), slice(0, 40))
+    assert LabelIndex(np.zeros((4, 4, 4), dtype=np.uint8)).extent() is None
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_float_label_maps_are_indexed(dtype):
+    index = LabelIndex(label_volume(dtype), brick_size=8)
+    assert set(index.boxes) == {1, 3}
+    assert index.has(1) and not index.has(2)
+    assert index.extent([1]) == LabelIndex(label_volume(), brick_size=8).extent([1])
+
+
+def test_non_label_volumes_fall_back_to_occupied_bricks():
+    intensities = label_volume(np.float32) * 0.5
+    index = LabelIndex(intensities, brick_size=8)
+    assert index.boxes is None
+    assert index.has(1)
+    assert index.extent([1]) == index.extent()
+    assert index.extent() is not None
@@ -0,0 +1,64 @@
+import gzip
+import struct
+
+import numpy as np
+import SimpleITK as sitk
+import vtkmodules.util.numpy_support as vtkutil
+
+from utils.nifti_mmap import read_nifti_header, map_nifti
+
+
+def write_nifti(path, array, spacing=(1.0, 2.0, 3.0)):
+    image = sitk.GetImageFromArray(array)
+    image.SetSpacing(spacing)
+    sitk.WriteImage(image, str(path))
+
+
+def test_nifti1_header(tmp_path):
+    path = tmp_path / "volume.nii"
+    write_nifti(path, np.zeros((4, 5, 6), dtype=np.int16))
+    header = read_nifti_header(path)
+    assert header["dim"][:4] == (3, 6, 5, 4)
+    assert header["datatype"] == 4
+    assert header["pixdim"][1:4] == (1.0, 2.0, 3.0)
+    assert header["vox_offset"] >= 348
+
+
+def test_nifti2_header(tmp_path):
+    raw = bytearray(544)
+    struct.pack_into('<i', raw, 0, 540)
+    raw[4:8] = b'n+2\x00'
+    struct.pack_into('<h', raw, 12, 16)
+    struct.pack_into('<8q', raw, 16, 3, 6, 5, 4, 1, 1, 1, 1)
+    struct.pack_into('<8d', raw, 104, 1.0, 0.5, 0.5, 2.0, 1.0, 1.0, 1.0, 1.0)
+    struct.pack_into('<q', raw, 168, 544)
+    path = tmp_path / "volume.nii"
+    path.write_bytes(bytes(raw))
+    header = read_nifti_header(path)
+    assert header["dim"][:4] == (3, 6, 5, 4)
+    assert header["datatype"] == 16
+    assert header["pixdim"][1:4] == (0.5, 0.5, 2.0)
+    assert header["vox_offset"] == 544
+
+
+def test_compressed_and_short_files_are_not_parsed(tmp_path):
+    path = tmp_path / "volume.nii"
+    write_nifti(path, np.zeros((2, 2, 2), dtype=np.uint8))
+    compressed = tmp_path / "volume.nii.gz"
+    compressed.write_bytes(gzip.compress(path.read_bytes()))
+    assert read_nifti_header(compressed) is None
+    short = tmp_path / "short.nii"
+    short.write_bytes(b"\x00" * 100)
+    assert read_nifti_header(short) is None
+
+
+def test_map_nifti_matches_the_stored_voxels(tmp_path):
+    path = tmp_path / "volume.nii"
+    array = np.arange(4 * 5 * 6, dtype=np.float32).reshape(4, 5, 6)
+    write_nifti(path, array)
+    vtk_img, qfac = map_nifti(path)
+    assert vtk_img.GetDimensions() == (6, 5, 4)
+    assert vtk_img.GetSpacing() == (1.0, 2.0, 3.0)
+    assert qfac == 1.0
+    scalars = vtkutil.vtk_to_numpy(vtk_img.GetPointData().GetScalars())
+    np.testing.assert_array_equal(scalars.reshape(4, 5, 6), array)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from utils.confusion import TN, TP, FP, FN
+from utils.slice_frames import overlay_codes, overlay_table, overlay_lut, LUT_SIZE, OVERLAY_SIZE
+
+
+def test_overlay_codes_of_selected_labels():
+    labels = np.array([0, 1, 2, 3, 9], dtype=np.uint8)
+    np.testing.assert_array_equal(overlay_codes(labels, [1, 3]), [0, 1, 0, 3, 0])
+    # Values past the table are clamped to the last label
+    np.testing.assert_array_equal(overlay_codes(labels, [LUT_SIZE - 1]), [0, 0, 0, 0, LUT_SIZE - 1])
+
+
+def test_overlay_codes_with_confusion():
+    labels = np.array([1, 1, 0, 2], dtype=np.uint8)
+    confusion = np.array([TP, FP, FN, TN], dtype=np.uint8)
+    codes = overlay_codes(labels, [1, 2], confusion, [TP, FN])
+    np.testing.assert_array_equal(codes, [1 + LUT_SIZE * TP, 1, LUT_SIZE * FN, 2])
+    assert codes.max() < OVERLAY_SIZE
+
+
+def test_overlay_table_blends_prediction_over_label():
+    rgb, opacity = overlay_table({1: (1.0, 0.0, 0.0)}, 0.5, {TP: (0.0, 0.0, 1.0)}, 0.5)
+    assert rgb.shape == (OVERLAY_SIZE, 3) and opacity.shape == (OVERLAY_SIZE,)
+    assert opacity[0] == 0
+    # Codes without a prediction match the plain label table
+    label_rgb, label_opacity = overlay_lut({1: (1.0, 0.0, 0.0)}, 0.5)
+    np.testing.assert_allclose(opacity[:LUT_SIZE], label_opacity)
+    np.testing.assert_allclose(rgb[1], label_rgb[1])
+    # Both layers: 1 - (1 - a)(1 - b), colour weighted by what each contributes
+    both = 1 + LUT_SIZE * TP
+    np.testing.assert_allclose(opacity[both], 0.75)
+    np.testing.assert_allclose(rgb[both], [1 / 3, 0.0, 2 / 3], rtol=1e-6)
+    # A prediction over the background shows only the prediction
+    np.testing.assert_allclose(opacity[LUT_SIZE * TP], 0.5)
+    np.testing.assert_allclose(rgb[LUT_SIZE * TP], [0.0, 0.0, 1.0])
+    np.testing.assert_allclose(opacity[LUT_SIZE * FP], 0)
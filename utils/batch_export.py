@@ -0,0 +1,273 @@
+import os
+import csv
+import glob
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import vtk
+
+from utils.configs import (
+    DEFAULT_COLORS, DEFAULT_SURFACE_PRESET, EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE, VIDEO_EXTENSIONS
+)
+from utils.vtk_tools import (
+    load_image, load_label, setup_actor, setup_surface_actor, label_surfaces, set_camera, quiet_vtk_logging
+)
+from utils.label_index import label_index_cache
+from utils.confusion import confusion_cache, CONFUSION_CODES
+from utils.frame_pipeline import create_offscreen_window, FrameGrabber, FrameEncoder, concat_videos
+from utils.slice_frames import SliceCompositor
+
+ORIENTATIONS = {"axial": 0, "sagittal": 1, "coronal": 2}
+
+
+class Case(object):
+    def __init__(self, name, image, label=None, pred=None):
+        self.name = name
+        self.image = image
+        self.label = label
+        self.pred = pred
+
+
+def read_manifest(file_name):
+    """
+    CSV with an image column and optional label, pred and name columns.
+    Relative paths are resolved against the manifest's folder.
+    """
+    root = os.path.dirname(os.path.abspath(file_name))
+    cases = []
+    with open(file_name, newline='') as f:
+        for row in csv.DictReader(f):
+            paths = {}
+            for column in ("image", "label", "pred"):
+                value = (row.get(column) or "").strip()
+                paths[column] = os.path.join(root, value) if value else None
+            name = (row.get("name") or "").strip() or case_name(paths["image"])
+            cases.append(Case(name, paths["image"], paths["label"], paths["pred"]))
+    return cases
+
+
+def find_cases(folder, image_pattern, label_pattern, pred_pattern):
+    # One case per sub-folder (or the folder itself) with exactly one image match
+    cases = []
+    for case_dir in [folder] + sorted(glob.glob(os.path.join(folder, "*", ""))):
+        images = sorted(glob.glob(os.path.join(case_dir, image_pattern)))
+        if len(images) != 1:
+            continue
+        labels = sorted(glob.glob(os.path.join(case_dir, label_pattern)))
+        preds = sorted(glob.glob(os.path.join(case_dir, pred_pattern)))
+        name = os.path.basename(os.path.normpath(case_dir))
+        if case_dir == folder:
+            name = case_name(images[0])
+        cases.append(Case(
+            name, images[0],
+            labels[0] if labels else None,
+            preds[0] if preds else None
+            ))
+    return cases
+
+
+def case_name(file_name):
+    name = os.path.basename(file_name)
+    for ext in (".nii.gz", ".nii"):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return os.path.splitext(name)[0]
+
+
+def write_frames(vtk_render_window, file_path, frames, profile):
+    # frames yields once per frame after updating the scene
+    grabber = FrameGrabber(vtk_render_window)
+    encoder = FrameEncoder.from_profile(file_path, profile)
+    try:
+        for _ in frames:
+            vtk_render_window.Render()
+            encoder.put(grabber.grab())
+    except Exception:
+        encoder.abort()
+        raise
+    encoder.close()
+
+
+def load_case(case):
+    brain_image_vtk = load_image(case.image)
+    label_image_vtk = load_label(case.label)[0] if case.label else None
+    pred_image_vtk = load_image(case.pred) if case.pred else None
+    confusion = None
+    if label_image_vtk is not None and pred_image_vtk is not None:
+        confusion = confusion_cache.get(label_image_vtk, pred_image_vtk)
+    return brain_image_vtk, label_image_vtk, confusion
+
+
+def segment_range(count, segment=(0, 1)):
+    # Frames of segment k out of n contiguous segments
+    k, n = segment
+    return range(count * k // n, count * (k + 1) // n)
+
+
+def export_rotation(case, file_path, labels, preds, preset=DEFAULT_SURFACE_PRESET,
+                    profile=EXPORT_PROFILES[DEFAULT_EXPORT_PROFILE], opacity=(0.1, 0.2, 0.2), segment=(0, 1)):
+    brain_image_vtk, label_image_vtk, confusion = load_case(case)
+    vtk_render_window, vtk_renderer = create_offscreen_window(profile["size"])
+    brain_opacity, label_opacity, pred_opacity = opacity
+
+    vtk_renderer.AddActor(setup_actor(
+        brain_image_vtk, brain_opacity, DEFAULT_COLORS["BRAIN_COLORS"], preset=preset
+        ))
+    if label_image_vtk is not None:
+        present = [l for l in labels if label_index_cache.get(label_image_vtk).has(l)]
+        for l, surface in label_surfaces(label_image_vtk, present, preset).items():
+            vtk_renderer.AddActor(setup_surface_actor(
+                surface, label_opacity, DEFAULT_COLORS["MASK_COLORS"][l]
+                ))
+    if confusion is not None:
+        present = [p for p in preds if confusion.has(p)]
+        surfaces = label_surfaces(confusion.vtk_img, [CONFUSION_CODES[p] for p in present], preset)
+        for p in present:
+            vtk_renderer.AddActor(setup_surface_actor(
+                surfaces[CONFUSION_CODES[p]], pred_opacity, DEFAULT_COLORS["PRED_COLORS"][p]
+                ))
+
+    set_camera(vtk_renderer)
+    camera = vtk_renderer.GetActiveCamera()
+
+    frames = segment_range(profile["frames"], segment)
+
+    def rotate():
+        # Earlier segments' steps are replayed without rendering, so the
+        # cameras are exactly those of a serial export
+        for i in range(frames.stop):
+            camera.Azimuth(360 / profile["frames"])
+            if i >= frames.start:
+                yield
+
+    write_frames(vtk_render_window, file_path, rotate(), profile)
+
+
+def export_slices(case, file_path, labels, preds, orientation=0,
+                  profile=EXPORT_PROFILES[DEFAULT_EXPORT_PROFILE], opacity=(0.2, 0.2), segment=(0, 1)):
+    # Composited from the arrays, no render window needed
+    brain_image_vtk, label_image_vtk, confusion = load_case(case)
+    label_opacity, pred_opacity = opacity
+
+    compositor = SliceCompositor(brain_image_vtk, orientation)
+    if label_image_vtk is not None and labels:
+        compositor.add_overlay(
+            label_image_vtk,
+            {l: DEFAULT_COLORS["MASK_COLORS"][l] for l in labels if l in DEFAULT_COLORS["MASK_COLORS"]},
+            label_opacity
+            )
+    if confusion is not None:
+        present = [p for p in preds if confusion.has(p)]
+        if present:
+            compositor.add_overlay(
+                confusion.vtk_img,
+                {CONFUSION_CODES[p]: DEFAULT_COLORS["PRED_COLORS"][p] for p in present},
+                pred_opacity
+                )
+
+    encoder = FrameEncoder.from_profile(
+        file_path, profile,
+        filters=compositor.filters(profile["size"], DEFAULT_COLORS["BACKGROUND_COLORS"])
+        )
+    try:
+        for slice_idx in segment_range(len(compositor), segment):
+            encoder.put(compositor.frame(slice_idx))
+    except Exception:
+        encoder.abort()
+        raise
+    encoder.close()
+
+
+def case_videos(case, output_dir, options):
+    # (file path, video) pairs, video being "rotation" or a slice orientation
+    extension = VIDEO_EXTENSIONS[EXPORT_PROFILES[options["profile"]]["codec"]]
+    videos = []
+    if options["rotation"]:
+        videos.append((os.path.join(output_dir, f"{case.name}_rotation{extension}"), "rotation"))
+    for orientation in options["slices"]:
+        videos.append((os.path.join(output_dir, f"{case.name}_{orientation}{extension}"), orientation))
+    return videos
+
+
+def segment_path(file_path, segment):
+    root, extension = os.path.splitext(file_path)
+    return f"{root}.part{segment:03d}{extension}"
+
+
+def export_video(case, file_path, video, options, segment=(0, 1)):
+    """
+    Render one video of a case, or one segment of it. Runs in a pool
+    worker, so errors are returned rather than raised.
+    """
+    try:
+        profile = EXPORT_PROFILES[options["profile"]]
+        if video == "rotation":
+            export_rotation(
+                case, file_path, options["labels"], options["preds"], options["preset"], profile,
+                segment=segment
+                )
+        else:
+            export_slices(
+                case, file_path, options["labels"], options["preds"], ORIENTATIONS[video], profile,
+                segment=segment
+                )
+        return None
+    except Exception:
+        return traceback.format_exc()
+
+
+def export_cases(cases, output_dir, options, workers=None, segments=None, report=print):
+    """
+    Cases are independent, so their videos are rendered by separate
+    processes. Each video can also be split into contiguous segments that
+    are rendered and encoded in parallel, then joined without re-encoding.
+    By default there are enough segments to keep every worker busy.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+    videos = [(case, file_path, video) for case in cases for file_path, video in case_videos(case, output_dir, options)]
+    codec = EXPORT_PROFILES[options["profile"]]["codec"]
+    if segments is None:
+        segments = -(-workers // max(len(videos), 1))
+    if codec == "gif":
+        segments = 1  # the palette is computed over the whole clip
+
+    failed = []
+    # Spawned workers do not inherit the parent's VTK log settings
+    with ProcessPoolExecutor(max_workers=workers, initializer=quiet_vtk_logging) as executor:
+        futures = {}
+        for case, file_path, video in videos:
+            parts = [file_path] if segments == 1 else [segment_path(file_path, k) for k in range(segments)]
+            job = {"case": case, "file_path": file_path, "parts": parts, "pending": len(parts), "errors": []}
+            for k, part in enumerate(parts):
+                futures[executor.submit(export_video, case, part, video, options, (k, segments))] = job
+
+        done = 0
+        for future in as_completed(futures):
+            job = futures[future]
+            error = future.result()
+            if error is not None:
+                job["errors"].append(error)
+            job["pending"] -= 1
+            if job["pending"]:
+                continue
+
+            done += 1
+            case, file_path, parts = job["case"], job["file_path"], job["parts"]
+            if len(parts) > 1:
+                if not job["errors"]:
+                    try:
+                        # Segments past the last frame write no file
+                        concat_videos([part for part in parts if os.path.exists(part)], file_path, codec)
+                    except Exception:
+                        job["errors"].append(traceback.format_exc())
+                for part in parts:
+                    if os.path.exists(part):
+                        os.remove(part)
+            if job["errors"]:
+                if case.name not in failed:
+                    failed.append(case.name)
+                report(f"[{done}/{len(videos)}] {file_path} failed:\n{job['errors'][0]}")
+            else:
+                report(f"[{done}/{len(videos)}] {file_path}")
+    return failed
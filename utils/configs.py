@@ -1,3 +1,5 @@
+import os
+
 DEFAULT_COLORS = {
     "BACKGROUND_COLORS" : (0.82, 0.82, 0.82), # Background color
     "BRAIN_COLORS" : (1.0,0.9,0.9)  ,         # Brain color
@@ -13,4 +15,85 @@ DEFAULT_COLORS = {
         'fp': (0.56, 0.1, 1),                 # False positive color
         'fn': (1, 0.5, 0)                     # False negative color
     }
-}
\ No newline at end of file
+}
+
+# Byte budget of the shared decoded-volume cache (utils.volume_store)
+VOLUME_STORE_MAX_BYTES = 4 * 1024 ** 3
+
+# Number of (label, prediction) confusion maps kept in memory (utils.confusion)
+CONFUSION_CACHE_SIZE = 8
+
+# On-disk cache of meshes, confusion maps and normalized volumes (utils.derived_cache)
+DERIVED_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "3d-mri-volume-visualizer")
+DERIVED_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Edge length in voxels of the bricks of the occupancy map, and number of
+# volumes whose label index is kept in memory (utils.label_index)
+LABEL_INDEX_BRICK_SIZE = 16
+LABEL_INDEX_CACHE_SIZE = 8
+
+# Surface quality presets (utils.vtk_tools): subsampling of the volume before
+# marching cubes, windowed-sinc smoothing passes and pass band, Surface Nets
+# smoothing passes for labels, and the triangle budget each mesh is decimated
+# to (None keeps every triangle)
+SURFACE_PRESETS = {
+    "preview": {
+        "shrink_factor": 2, "iterations": 10, "pass_band": 0.1,
+        "nets_iterations": 10, "target_triangles": 100000
+    },
+    "standard": {
+        "shrink_factor": 1, "iterations": 20, "pass_band": 0.05,
+        "nets_iterations": 20, "target_triangles": 200000
+    },
+    "publication": {
+        "shrink_factor": 1, "iterations": 40, "pass_band": 0.01,
+        "nets_iterations": 40, "target_triangles": None
+    },
+}
+DEFAULT_SURFACE_PRESET = "standard"
+
+# Level of detail (utils.vtk_tools): meshes above LOD_MIN_TRIANGLES also get
+# quadric-clustered copies on these grids, drawn while the view is rotated.
+# Frame rates requested from the interactor while dragging and at rest
+LOD_MIN_TRIANGLES = 20000
+LOD_DIVISIONS = (64, 32)
+INTERACTIVE_UPDATE_RATE = 15.0
+STILL_UPDATE_RATE = 0.001
+
+# Frames rendered ahead of the encoder thread during video export (utils.frame_pipeline)
+EXPORT_QUEUE_SIZE = 8
+
+# Milliseconds between checks while a 3D export waits for its encoder (utils.video_export)
+EXPORT_POLL_INTERVAL = 5
+
+# Video export profiles (utils.frame_pipeline): frame size, frames per full
+# turn of the 3D view, frame rate, ffmpeg codec, constant rate factor (lower
+# is better, unused for GIF) and encoder threads (0 lets ffmpeg decide)
+EXPORT_PROFILES = {
+    "preview": {"size": (854, 480), "frames": 90, "fps": 30, "codec": "libx264", "crf": 28, "threads": 0},
+    "standard": {"size": (1920, 1080), "frames": 360, "fps": 30, "codec": "libx264", "crf": 23, "threads": 0},
+    "publication": {"size": (3840, 2160), "frames": 720, "fps": 60, "codec": "libx265", "crf": 18, "threads": 0},
+    "webm": {"size": (1280, 720), "frames": 180, "fps": 30, "codec": "libvpx-vp9", "crf": 32, "threads": 0},
+    "gif": {"size": (640, 360), "frames": 120, "fps": 15, "codec": "gif", "crf": None, "threads": 0},
+}
+DEFAULT_EXPORT_PROFILE = "standard"
+VIDEO_EXTENSIONS = {"libx264": ".mp4", "libx265": ".mp4", "libvpx-vp9": ".webm", "gif": ".gif"}
+
+# Intensity window of the slice views (utils.vtk_tools, utils.slice_frames)
+SLICE_WINDOW = 400
+SLICE_LEVEL = 200
+
+# Height in pixels of the titles above each panel of multi-image videos (utils.slice_viewer_util)
+TITLE_HEIGHT = 24
+
+# Byte budget of the compressed frames kept from the last 3D export (utils.frame_cache)
+FRAME_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Frames per turn of the pre-rendered turntable of the 3D view (utils.turntable)
+TURNTABLE_FRAMES = 360
+
+# Threads writing PNG snapshots, slices composited per batch and PNG zlib
+# level; level 1 writes about three times faster for files ~2% larger (utils.snapshots)
+SNAPSHOT_WORKERS = 4
+SNAPSHOT_BATCH = 32
+SNAPSHOT_COMPRESS_LEVEL = 1
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.configs import CONFUSION_CACHE_SIZE
+from utils.vtk_tools import vtk_img_to_numpy, numpy_to_vtk_img
+from utils.derived_cache import derived_cache, get_source_key, set_source_key
+
+# Confusion code stored per voxel
+TN, TP, FP, FN = 0, 1, 2, 3
+CONFUSION_CODES = {'tp': TP, 'fp': FP, 'fn': FN}
+
+# (gt != 0) + 2 * (pred != 0) -> confusion code
+_CODE_LUT = np.array([TN, FN, FP, TP], dtype=np.uint8)
+
+
+def confusion_codes(gt, pred):
+    codes = (pred != 0).view(np.uint8) << 1
+    codes |= (gt != 0).view(np.uint8)
+    return np.take(_CODE_LUT, codes, out=codes)
+
+
+class ConfusionMap(object):
+    def __init__(self, codes, reference_vtk_img, source_key=None):
+        self.codes = codes
+        self.counts = np.bincount(codes.ravel(), minlength=4)
+        self.vtk_img = numpy_to_vtk_img(codes, reference_vtk_img)
+        if source_key is not None:
+            set_source_key(self.vtk_img, source_key)
+
+    def has(self, kind):
+        return self.counts[CONFUSION_CODES[kind]] > 0
+
+
+class ConfusionCache(object):
+    """
+    Confusion maps of (label, prediction) pairs. Keyed by the underlying
+    scalar arrays, so every view of the same stored volume shares one map.
+    """
+    def __init__(self, max_entries=CONFUSION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, label_vtk_img, pred_vtk_img):
+        return (
+            label_vtk_img.GetPointData().GetScalars().__this__,
+            pred_vtk_img.GetPointData().GetScalars().__this__
+            )
+
+    def peek(self, label_vtk_img, pred_vtk_img):
+        # Returns the map only if it is already in memory
+        with self.lock:
+            entry = self.entries.get(self.key(label_vtk_img, pred_vtk_img))
+            return entry[0] if entry is not None else None
+
+    def get(self, label_vtk_img, pred_vtk_img):
+        label_scalars = label_vtk_img.GetPointData().GetScalars()
+        pred_scalars = pred_vtk_img.GetPointData().GetScalars()
+        key = self.key(label_vtk_img, pred_vtk_img)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry[0]
+
+        sources = [get_source_key(label_vtk_img), get_source_key(pred_vtk_img)]
+        codes = derived_cache.array(
+            "confusion", sources, None,
+            lambda: confusion_codes(vtk_img_to_numpy(label_vtk_img), vtk_img_to_numpy(pred_vtk_img))
+            )
+        source_key = None if None in sources else "confusion|" + "|".join(sources)
+        confusion = ConfusionMap(codes, label_vtk_img, source_key)
+
+        with self.lock:
+            # The scalar arrays are kept alive with the entry so their addresses stay unique
+            self.entries[key] = (confusion, label_scalars, pred_scalars)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return confusion
+
+
+confusion_cache = ConfusionCache()
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import threading
+import uuid
+
+import numpy as np
+import vtk
+
+from utils.configs import DERIVED_CACHE_DIR, DERIVED_CACHE_MAX_BYTES
+
+SOURCE_KEY_NAME = "SourceKey"
+
+
+def set_source_key(vtk_img, source_key):
+    # Stored as field data so shallow copies of the image keep it
+    array = vtk.vtkStringArray()
+    array.SetName(SOURCE_KEY_NAME)
+    array.InsertNextValue(source_key)
+    vtk_img.GetFieldData().AddArray(array)
+
+
+def get_source_key(vtk_img):
+    array = vtk_img.GetFieldData().GetAbstractArray(SOURCE_KEY_NAME)
+    if array is None or array.GetNumberOfValues() == 0:
+        return None
+    return array.GetValue(0)
+
+
+class DerivedCache(object):
+    """
+    On-disk cache of data derived from input volumes (surfaces, confusion
+    maps, normalized volumes). Entries are addressed by a hash of the
+    source file identities and the pipeline parameters, and evicted by
+    least recent use once the directory exceeds max_bytes.
+    """
+    def __init__(self, cache_dir=DERIVED_CACHE_DIR, max_bytes=DERIVED_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def key(self, kind, sources, params=None):
+        if any(source is None for source in sources):
+            return None
+        text = json.dumps([kind, list(sources), params], sort_keys=True, default=str)
+        return f"{kind}-{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+    def path(self, key, ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def lookup(self, key, ext):
+        if key is None:
+            return None
+        path = self.path(key, ext)
+        try:
+            os.utime(path)  # mtime doubles as the LRU timestamp
+        except OSError:
+            return None
+        return path
+
+    def write(self, key, ext, write_func):
+        if key is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.path(key, ext)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp{ext}"
+            write_func(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            try:
+                files = []
+                for name in os.listdir(self.cache_dir):
+                    if ".tmp" in name:
+                        continue
+                    path = os.path.join(self.cache_dir, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                return
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def load_polydata(self, key):
+        path = self.lookup(key, ".vtp")
+        if path is None:
+            return None
+        reader = vtk.vtkXMLPolyDataReader()
+        reader.SetFileName(path)
+        reader.Update()
+        if reader.GetErrorCode():
+            return None
+        return reader.GetOutput()
+
+    def save_polydata(self, key, polydata):
+        def write_func(path):
+            writer = vtk.vtkXMLPolyDataWriter()
+            writer.SetFileName(path)
+            writer.SetInputData(polydata)
+            writer.SetDataModeToBinary()
+            if not writer.Write():
+                raise OSError(f"Cannot write {path}")
+        self.write(key, ".vtp", write_func)
+
+    def load_array(self, key):
+        path = self.lookup(key, ".npy")
+        if path is None:
+            return None
+        try:
+            return np.load(path, mmap_mode='c')
+        except (OSError, ValueError):
+            return None
+
+    def save_array(self, key, array):
+        def write_func(path):
+            with open(path, 'wb') as f:
+                np.save(f, array)
+        self.write(key, ".npy", write_func)
+
+    def surface(self, vtk_img, params, build):
+        key = self.key("surface", [get_source_key(vtk_img)], params)
+        polydata = self.load_polydata(key)
+        if polydata is None:
+            polydata = build()
+            self.save_polydata(key, polydata)
+        return polydata
+
+    def surfaces(self, vtk_img, label_values, params, build_all):
+        # One surface per label; if any is missing from the cache, all of
+        # label_values are rebuilt together in one call
+        source_key = get_source_key(vtk_img)
+        keys = {}
+        surfaces = {}
+        for value in label_values:
+            keys[value] = self.key("surface", [source_key], dict(params, label_value=value))
+            polydata = self.load_polydata(keys[value])
+            if polydata is not None:
+                surfaces[value] = polydata
+        if len(surfaces) < len(keys):
+            for value, polydata in build_all(label_values).items():
+                self.save_polydata(keys[value], polydata)
+                surfaces[value] = polydata
+        return surfaces
+
+    def array(self, kind, sources, params, build):
+        key = self.key(kind, sources, params)
+        array = self.load_array(key)
+        if array is None:
+            array = build()
+            self.save_array(key, array)
+        return array
+
+
+derived_cache = DerivedCache()
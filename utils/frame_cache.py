@@ -0,0 +1,145 @@
+import os
+import zlib
+import atexit
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import vtk
+
+from utils.configs import FRAME_CACHE_MAX_BYTES
+
+
+def prop_state(prop):
+    # Modification times that rendering leaves alone: the actor and mapper
+    # times advance on every render, the volume property's too
+    prop_property = prop.GetProperty()
+    if isinstance(prop, vtk.vtkVolume):
+        style = (
+            prop_property.GetScalarOpacity().GetMTime(),
+            prop_property.GetRGBTransferFunction().GetMTime()
+            )
+    else:
+        style = prop_property.GetMTime()
+    data = prop.GetMapper().GetInputDataObject(0, 0)
+    return (prop.__this__, style, data.__this__, data.GetMTime())
+
+
+def scene_key(vtk_renderer):
+    props = vtk_renderer.GetViewProps()
+    state = [tuple(vtk_renderer.GetBackground())]
+    for i in range(props.GetNumberOfItems()):
+        prop = props.GetItemAsObject(i)
+        if prop.GetVisibility():
+            state.append(prop_state(prop))
+    return repr(state)
+
+
+class FrameCache(object):
+    """
+    Frames of the last turntable export, zlib-compressed in a temporary
+    directory. Exporting the same scene again with another codec or frame
+    rate, or at a smaller size of the same aspect ratio, re-encodes these
+    frames instead of rendering them. Frames are kept for one scene only
+    and dropped as soon as it changes or the cache outgrows max_bytes; a
+    dropped directory still being read by an export goes once it is done.
+    """
+    def __init__(self, max_bytes=FRAME_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.cache_dir = None
+        self.readers = 0
+        self.stale = []
+        self.reset()
+        atexit.register(self.clear)
+
+    def reset(self):
+        self.key = None
+        self.size = None
+        self.shape = None
+        self.paths = []
+        self.nbytes = 0
+        self.complete = False
+
+    def clear(self):
+        with self.lock:
+            if self.cache_dir is not None:
+                self.stale.append(self.cache_dir)
+            self.cache_dir = None
+            self.reset()
+            self.remove_stale()
+
+    def remove_stale(self):
+        # Called with the lock held
+        if not self.readers:
+            for cache_dir in self.stale:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            self.stale = []
+
+    def lookup(self, key, size, frames):
+        # Indices of the cached frames that make up a frames-long turn at size, or None
+        if not self.complete or key != self.key:
+            return None
+        width, height = self.size
+        if size[0] > width or size[1] > height or abs(size[0] * height - size[1] * width) > width:
+            return None
+        if len(self.paths) % frames:
+            return None
+        step = len(self.paths) // frames
+        # Frame j of the coarser turn sits at the angle of cached frame (j + 1) * step - 1
+        return [(j + 1) * step - 1 for j in range(frames)]
+
+    def begin(self, key, size):
+        self.clear()
+        with self.lock:
+            self.cache_dir = tempfile.mkdtemp(prefix="frames-")
+            self.key = key
+            self.size = tuple(size)
+
+    def store(self, frame):
+        # Runs on the encoder thread
+        data = zlib.compress(frame, 1)
+        with self.lock:
+            if self.cache_dir is None:
+                return
+            path = os.path.join(self.cache_dir, f"{len(self.paths):05d}.z")
+            try:
+                if self.nbytes + len(data) > self.max_bytes:
+                    raise OSError("Frame cache is full")
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except OSError:
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
+                self.cache_dir = None
+                self.reset()
+                return
+            self.paths.append(path)
+            self.nbytes += len(data)
+            self.shape = frame.shape
+
+    def finish(self, key):
+        # A scene changed during the export would have mixed frames
+        if key != self.key:
+            self.clear()
+            return
+        with self.lock:
+            self.complete = self.cache_dir is not None and bool(self.paths)
+
+    def frames(self, indices):
+        # Generator of the frames at indices, readable to the end even if the
+        # cache is cleared meanwhile; release() once the export is over
+        with self.lock:
+            self.readers += 1
+            paths = [self.paths[index] for index in indices]
+            shape = self.shape
+        return (self.read(path, shape) for path in paths)
+
+    def read(self, path, shape):
+        with open(path, 'rb') as f:
+            return np.frombuffer(zlib.decompress(f.read()), dtype=np.uint8).reshape(shape)
+
+    def release(self):
+        with self.lock:
+            self.readers -= 1
+            self.remove_stale()
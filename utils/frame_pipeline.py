@@ -0,0 +1,212 @@
+import os
+import queue
+import threading
+import subprocess
+
+import numpy as np
+import vtk
+import imageio_ffmpeg
+import vtkmodules.util.numpy_support as vtkutil
+
+from utils.configs import DEFAULT_COLORS, EXPORT_QUEUE_SIZE
+
+
+def create_offscreen_window(size, background=DEFAULT_COLORS["BACKGROUND_COLORS"]):
+    vtk_render_window = vtk.vtkRenderWindow()
+    vtk_render_window.SetOffScreenRendering(1)
+    vtk_render_window.SetSize(size[0], size[1])
+    vtk_renderer = vtk.vtkRenderer()
+    vtk_renderer.SetBackground(background)
+    vtk_render_window.AddRenderer(vtk_renderer)
+    return vtk_render_window, vtk_renderer
+
+
+def export_prop(prop):
+    # The same prop over the same data, but drawn through a mapper of its
+    # own: a mapper holds the graphics resources of the window drawing it
+    # and cannot be shared by two windows. LOD actors render at full detail.
+    mapper = prop.GetMapper()
+    export_mapper = mapper.NewInstance()
+    export_mapper.ShallowCopy(mapper)
+    export_mapper.SetInputConnection(mapper.GetInputConnection(0, 0))
+    copy = vtk.vtkActor() if isinstance(prop, vtk.vtkLODActor) else prop.NewInstance()
+    copy.ShallowCopy(prop)
+    copy.SetMapper(export_mapper)
+    return copy
+
+
+def detached_prop(prop):
+    # As export_prop, but with a property of its own too, so later changes
+    # to the interactive prop do not reach the copy
+    copy = export_prop(prop)
+    prop_property = prop.GetProperty().NewInstance()
+    prop_property.DeepCopy(prop.GetProperty())
+    copy.SetProperty(prop_property)
+    return copy
+
+
+class ExportWindow(object):
+    """
+    Offscreen render window showing the visible props of an interactive
+    renderer, so exports neither resize nor move the on-screen view. The
+    props are drawn through mappers of their own (see export_prop). With
+    detached=True it shows copies of the props, so the view can be edited
+    while the export is still rendering.
+    """
+    def __init__(self, source_renderer, size, detached=False):
+        self.vtk_render_window, self.vtk_renderer = create_offscreen_window(
+            size, source_renderer.GetBackground()
+            )
+        props = source_renderer.GetViewProps()
+        for i in range(props.GetNumberOfItems()):
+            prop = props.GetItemAsObject(i)
+            if prop.GetVisibility():
+                self.vtk_renderer.AddViewProp(detached_prop(prop) if detached else export_prop(prop))
+        self.vtk_renderer.GetActiveCamera().DeepCopy(source_renderer.GetActiveCamera())
+
+    def close(self):
+        # Releases the graphics resources of the copied mappers
+        self.vtk_renderer.RemoveAllViewProps()
+        self.vtk_render_window.Finalize()
+
+
+class FrameGrabber(object):
+    """
+    Reads rendered frames back into a ring of preallocated buffers. Rows
+    are bottom-up as OpenGL returns them; FrameEncoder flips them while
+    encoding. With the default size a slot is only reused after the
+    encoder has consumed it (queue + the frame being encoded + one).
+    """
+    def __init__(self, vtk_render_window, slots=EXPORT_QUEUE_SIZE + 2):
+        self.vtk_render_window = vtk_render_window
+        self.width, self.height = vtk_render_window.GetSize()
+        self.frames = np.empty((slots, self.height, self.width, 3), dtype=np.uint8)
+        # VTK arrays viewing each slot, so the readback lands in place
+        self.buffers = [
+            vtkutil.numpy_to_vtk(frame.reshape(-1, 3), deep=False) for frame in self.frames
+            ]
+        self.index = 0
+
+    def grab(self):
+        frame, buffer = self.frames[self.index], self.buffers[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        self.vtk_render_window.GetPixelData(0, 0, self.width - 1, self.height - 1, 0, buffer, 0)
+        return frame
+
+
+class FrameEncoder(object):
+    """
+    Video writer fed through a bounded queue and drained by its own thread,
+    so frames are encoded while the next ones are rendered. put() blocks
+    only when the encoder falls EXPORT_QUEUE_SIZE frames behind.
+    """
+    def __init__(self, file_path, fps=30, codec="libx264", crf=None, threads=0,
+                 flip=True, filters=(), on_frame=None, queue_size=EXPORT_QUEUE_SIZE):
+        self.file_path = file_path
+        self.fps = fps
+        self.codec = codec
+        self.crf = crf
+        self.threads = threads
+        self.flip = flip
+        self.filters = list(filters)
+        self.on_frame = on_frame    # called on the encoder thread after each frame
+        self.writer = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.aborted = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def from_profile(cls, file_path, profile, **kwargs):
+        return cls(
+            file_path, profile["fps"], profile["codec"], profile["crf"], profile["threads"], **kwargs
+            )
+
+    def open_writer(self, frame):
+        # Filters run inside ffmpeg: vflip only adjusts line strides, and odd
+        # sizes are padded for yuv420p instead of rescaled to 16-pixel blocks
+        filters = (["vflip"] if self.flip else []) + self.filters
+        height, width = frame.shape[:2]
+        output_params = []
+        pixelformat = "yuv420p"
+        if self.codec == "gif":
+            # A palette computed from the whole clip instead of a fixed 256 colours
+            filters.append("split[a][b];[a]palettegen[p];[b][p]paletteuse")
+            pixelformat = "pal8"
+        elif width % 2 or height % 2:
+            filters.append("pad=ceil(iw/2)*2:ceil(ih/2)*2")
+        if self.crf is not None and self.codec != "gif":
+            output_params += ["-crf", str(self.crf)]
+            if self.codec == "libvpx-vp9":
+                output_params += ["-b:v", "0"]  # constant quality mode
+        if self.codec == "libx265":
+            output_params += ["-tag:v", "hvc1", "-x265-params", "log-level=error"]
+        if self.threads:
+            output_params += ["-threads", str(self.threads)]
+        if filters:
+            output_params += ["-vf", ",".join(filters)]
+        # imageio_ffmpeg directly, imageio's writer only accepts video file extensions
+        self.writer = imageio_ffmpeg.write_frames(
+            self.file_path, (width, height), fps=self.fps, codec=self.codec, quality=None,
+            pix_fmt_out=pixelformat, macro_block_size=1, output_params=output_params
+            )
+        self.writer.send(None)
+
+    def run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                return
+            if self.error is None and not self.aborted:
+                try:
+                    if self.writer is None:
+                        self.open_writer(frame)
+                    self.writer.send(frame)
+                    if self.on_frame is not None:
+                        self.on_frame(frame)
+                except Exception as e:
+                    # Remaining frames are drained so the producer never blocks
+                    self.error = e
+
+    def put(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(frame)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.writer is not None:
+            self.writer.close()
+        if self.error is not None:
+            raise self.error
+
+    def abort(self):
+        # Frames still queued are dropped instead of encoded
+        self.aborted = True
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def concat_videos(part_paths, file_path, codec="libx264"):
+    # Stream copy through ffmpeg's concat demuxer, the parts are not re-encoded
+    list_path = f"{file_path}.parts.txt"
+    with open(list_path, "w") as f:
+        for path in part_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy"
+        ]
+    if codec == "libx265":
+        command += ["-tag:v", "hvc1"]
+    try:
+        result = subprocess.run(command + [file_path], capture_output=True, text=True)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {result.stderr.strip()}")
@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import ndimage
+import vtkmodules.util.numpy_support as vtkutil
+
+from utils.configs import LABEL_INDEX_BRICK_SIZE, LABEL_INDEX_CACHE_SIZE
+
+# Volumes with larger integer values are intensities, not labels
+MAX_LABEL_VALUE = 255
+
+
+def label_values(np_array):
+    """
+    np_array as integer labels for find_objects, or None if it holds
+    negative, fractional or larger-than-label values. Float label maps
+    with integral values are cast.
+    """
+    if not np_array.size:
+        return None
+    if not (np.issubdtype(np_array.dtype, np.integer) or np.issubdtype(np_array.dtype, np.floating)):
+        return None
+    if not (0 <= np_array.min() and np_array.max() <= MAX_LABEL_VALUE):
+        return None
+    if np.issubdtype(np_array.dtype, np.integer):
+        return np_array
+    labels = np_array.astype(np.uint8)
+    if not np.array_equal(labels, np_array):
+        return None
+    return labels
+
+
+class LabelIndex(object):
+    """
+    Where the non-zero voxels of a volume are: the bounding box of every
+    label value and a coarse map of the bricks holding any non-zero voxel.
+    Used to run surface extraction on the occupied sub-extent only.
+    """
+    def __init__(self, np_array, brick_size=LABEL_INDEX_BRICK_SIZE):
+        self.shape = np_array.shape
+        self.brick_size = brick_size
+
+        # None when the volume does not look like a label map; lookups then
+        # fall back to the non-zero bricks
+        self.boxes = None
+        labels = label_values(np_array)
+        if labels is not None:
+            self.boxes = {}
+            for value, box in enumerate(ndimage.find_objects(labels), 1):
+                if box is not None:
+                    self.boxes[value] = box
+
+        # (z, y, x) brick occupancy, reduced one axis at a time to keep partial bricks
+        bricks = np_array != 0
+        for axis in range(3):
+            bricks = np.logical_or.reduceat(bricks, np.arange(0, self.shape[axis], brick_size), axis=axis)
+        self.bricks = bricks
+
+    def has(self, value):
+        return self.boxes is None or value in self.boxes
+
+    def occupied_box(self):
+        occupied = np.nonzero(self.bricks)
+        if occupied[0].size == 0:
+            return None
+        return tuple(
+            slice(int(index.min()) * self.brick_size, min((int(index.max()) + 1) * self.brick_size, size))
+            for index, size in zip(occupied, self.shape)
+            )
+
+    def extent(self, values=None, pad=1):
+        """
+        VTK extent (x0, x1, y0, y1, z0, z1) covering the given label values,
+        or every non-zero brick if values is None or the volume is not a
+        label map, grown by pad voxels so the boundary of the labels stays
+        inside. None if nothing is there.
+        """
+        if values is None or self.boxes is None:
+            boxes = [self.occupied_box()]
+        else:
+            boxes = [self.boxes.get(value) for value in values]
+        boxes = [box for box in boxes if box is not None]
+        if not boxes:
+            return None
+
+        extent = []
+        for axis in (2, 1, 0):
+            start = min(box[axis].start for box in boxes) - pad
+            stop = max(box[axis].stop for box in boxes) - 1 + pad
+            extent += [max(start, 0), min(stop, self.shape[axis] - 1)]
+        return extent
+
+
+class LabelIndexCache(object):
+    """
+    Label indexes of loaded volumes, keyed by the scalar array so every view
+    of the same stored volume shares one index.
+    """
+    def __init__(self, max_entries=LABEL_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, vtk_img):
+        scalars = vtk_img.GetPointData().GetScalars()
+        key = scalars.__this__
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry[0]
+
+        dims = vtk_img.GetDimensions()
+        index = LabelIndex(vtkutil.vtk_to_numpy(scalars).reshape(dims[2], dims[1], dims[0]))
+
+        with self.lock:
+            # The scalar array is kept alive with the entry so its address stays unique
+            self.entries[key] = (index, scalars)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return index
+
+
+label_index_cache = LabelIndexCache()
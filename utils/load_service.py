@@ -0,0 +1,141 @@
+import os
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from utils.qt_signals import emit
+from utils.volume_store import LoadCancelled
+
+
+class LoadSignals(QObject):
+    progress = Signal(str, int, int)        # key, generation, percent
+    finished = Signal(str, int, object)     # key, generation, result
+    failed = Signal(str, int, object)       # key, generation, exception
+
+
+class LoadHandle(object):
+    def __init__(self, key, generation, name, on_loaded, on_failed):
+        self.key = key
+        self.generation = generation
+        self.name = name
+        self.on_loaded = on_loaded
+        self.on_failed = on_failed
+        self.cancel_event = threading.Event()
+
+
+class LoadTask(QRunnable):
+    def __init__(self, handle, job, signals):
+        super().__init__()
+        self.handle = handle
+        self.job = job
+        self.signals = signals
+        self.last_percent = -1
+
+    def cancelled(self):
+        return self.handle.cancel_event.is_set()
+
+    def report(self, fraction):
+        percent = int(fraction * 100)
+        if percent != self.last_percent:
+            self.last_percent = percent
+            emit(self.signals.progress, self.handle.key, self.handle.generation, percent)
+
+    def run(self):
+        key, generation = self.handle.key, self.handle.generation
+        try:
+            if self.cancelled():
+                raise LoadCancelled()
+            result = self.job(self.report, self.cancelled)
+            if self.cancelled():
+                raise LoadCancelled()
+            emit(self.signals.finished, key, generation, result)
+        except Exception as e:
+            emit(self.signals.failed, key, generation, e)
+
+
+class LoadService(QObject):
+    """
+    Runs volume loaders and other background jobs on a QThreadPool. Each
+    job is registered under a key (e.g. "rw.brain"); starting a new job for
+    a key supersedes the previous one, whose result is dropped instead of
+    being applied.
+    """
+    progress = Signal(str, int)     # job name, percent
+    active_changed = Signal(int)    # number of loads in flight
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool.globalInstance()
+        self.signals = LoadSignals()
+        self.signals.progress.connect(self.on_progress)
+        self.signals.finished.connect(self.on_finished)
+        self.signals.failed.connect(self.on_failed)
+        self.generation = 0
+        self.handles = {}
+
+    def load(self, key, file_name, loader, on_loaded, on_failed=None):
+        self.submit(
+            key, f"Loading {os.path.basename(file_name)}",
+            lambda progress, cancelled: loader(file_name, progress, cancelled),
+            on_loaded, on_failed
+            )
+
+    def submit(self, key, name, job, on_loaded, on_failed=None):
+        # job(progress, cancelled) runs on the pool; its result is passed to on_loaded
+        self.cancel(key, notify=False)
+        self.generation += 1
+        handle = LoadHandle(key, self.generation, name, on_loaded, on_failed)
+        self.handles[key] = handle
+        emit(self.active_changed, len(self.handles))
+        self.pool.start(LoadTask(handle, job, self.signals))
+
+    def cancel(self, key, notify=True):
+        handle = self.handles.pop(key, None)
+        if handle is None:
+            return
+        handle.cancel_event.set()
+        emit(self.active_changed, len(self.handles))
+        if notify and handle.on_failed is not None:
+            handle.on_failed(LoadCancelled())
+
+    def cancel_all(self):
+        for key in list(self.handles):
+            self.cancel(key)
+
+    def is_loading(self, key):
+        return key in self.handles
+
+    def take(self, key, generation):
+        # Returns the handle only if this result belongs to the latest load of key
+        handle = self.handles.get(key)
+        if handle is None or handle.generation != generation:
+            return None
+        del self.handles[key]
+        emit(self.active_changed, len(self.handles))
+        return handle
+
+    def on_progress(self, key, generation, percent):
+        handle = self.handles.get(key)
+        if handle is not None and handle.generation == generation:
+            emit(self.progress, handle.name, percent)
+
+    def on_finished(self, key, generation, result):
+        handle = self.take(key, generation)
+        if handle is not None:
+            handle.on_loaded(result)
+
+    def on_failed(self, key, generation, error):
+        handle = self.take(key, generation)
+        if handle is not None and handle.on_failed is not None:
+            handle.on_failed(error)
+
+
+load_service = None
+
+
+def get_load_service():
+    # Created lazily so it lives on the GUI thread after QApplication exists
+    global load_service
+    if load_service is None:
+        load_service = LoadService()
+    return load_service
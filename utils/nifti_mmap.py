@@ -0,0 +1,88 @@
+import struct
+
+import numpy as np
+import vtk
+
+from utils.vtk_bridge import numpy_to_vtk_array
+
+# NIfTI datatype code -> numpy dtype (scalar types only)
+NIFTI_DTYPES = {
+    2: np.uint8,
+    4: np.int16,
+    8: np.int32,
+    16: np.float32,
+    64: np.float64,
+    256: np.int8,
+    512: np.uint16,
+    768: np.uint32,
+    1024: np.int64,
+    1280: np.uint64,
+}
+
+
+def read_nifti_header(file_name):
+    """
+    Parse the fields of a single-file NIfTI-1/NIfTI-2 header needed to map
+    the voxel block. Returns None if the file is not a native-endian .nii.
+    """
+    with open(file_name, 'rb') as f:
+        raw = f.read(540)
+    if len(raw) < 348:
+        return None
+
+    sizeof_hdr = struct.unpack('<i', raw[:4])[0]
+    if sizeof_hdr == 348 and raw[344:348] == b'n+1\x00':
+        dim = struct.unpack('<8h', raw[40:56])
+        datatype = struct.unpack('<h', raw[70:72])[0]
+        pixdim = struct.unpack('<8f', raw[76:108])
+        vox_offset = struct.unpack('<f', raw[108:112])[0]
+    elif sizeof_hdr == 540 and len(raw) == 540 and raw[4:8] == b'n+2\x00':
+        datatype = struct.unpack('<h', raw[12:14])[0]
+        dim = struct.unpack('<8q', raw[16:80])
+        pixdim = struct.unpack('<8d', raw[104:168])
+        vox_offset = struct.unpack('<q', raw[168:176])[0]
+    else:
+        # Big-endian or non single-file headers are left to vtkNIFTIImageReader
+        return None
+
+    return {
+        'dim': dim,
+        'datatype': datatype,
+        'pixdim': pixdim,
+        'vox_offset': int(vox_offset),
+    }
+
+
+def map_nifti(file_name):
+    """
+    Memory-map the voxel block of an uncompressed .nii and wrap it in a
+    vtkImageData without copying. Returns (vtk_img, qfac), or None when the
+    layout needs the conversions done by vtkNIFTIImageReader.
+    """
+    header = read_nifti_header(file_name)
+    if header is None:
+        return None
+
+    dim = header['dim']
+    dtype = NIFTI_DTYPES.get(header['datatype'])
+    if dtype is None or not 1 <= dim[0] <= 7 or any(d != 1 for d in dim[4:dim[0] + 1]):
+        return None
+    nx, ny, nz = [max(int(d), 1) if i < dim[0] else 1 for i, d in enumerate(dim[1:4])]
+
+    # vtkNIFTIImageReader reverses the slice order for qfac = -1
+    qfac = -1.0 if header['pixdim'][0] < 0 else 1.0
+    if qfac < 0 and nz > 1:
+        return None
+
+    # Copy-on-write keeps the pages shared with the page cache while giving VTK a writable buffer
+    np_array = np.memmap(
+        file_name, dtype=dtype, mode='c',
+        offset=header['vox_offset'], shape=(nz * ny * nx,)
+        )
+
+    vtk_img = vtk.vtkImageData()
+    vtk_img.SetDimensions(nx, ny, nz)
+    vtk_img.SetSpacing([abs(float(s)) if s else 1.0 for s in header['pixdim'][1:4]])
+    vtk_img.SetOrigin(0, 0, 0)
+    vtk_img.GetPointData().SetScalars(numpy_to_vtk_array(np_array))
+    return vtk_img, qfac
@@ -0,0 +1,30 @@
+import ctypes
+import sys
+
+from PySide6.QtCore import QObject, Signal
+
+
+class _Probe(QObject):
+    fired = Signal()
+
+
+def _emit_drops_true():
+    # Some PySide6 releases (seen in 6.12.0) return True from SignalInstance.emit
+    # without taking a reference, so every emit from Python releases one reference
+    # to True until the interpreter crashes in bool_dealloc at exit.
+    probe = _Probe()
+    count = 8
+    before = sys.getrefcount(True)
+    for _ in range(count):
+        probe.fired.emit()
+    return before - sys.getrefcount(True) >= count
+
+
+EMIT_DROPS_TRUE = _emit_drops_true()
+
+
+def emit(signal, *args):
+    """Emits signal, restoring the reference to True that affected PySide6 builds drop."""
+    signal.emit(*args)
+    if EMIT_DROPS_TRUE:
+        ctypes.pythonapi.Py_IncRef(ctypes.py_object(True))
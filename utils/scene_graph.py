@@ -0,0 +1,62 @@
+def volume_key(vtk_img):
+    # Views of the same stored volume share their scalar array
+    return vtk_img.GetPointData().GetScalars().__this__
+
+
+class SceneGraph(object):
+    """
+    Actors of the 3D render keyed by (volume, value). Surfaces are only
+    extracted the first time a key is requested; later renders just toggle
+    visibility. Actors of volumes that are no longer loaded are dropped.
+    """
+    def __init__(self, vtk_renderer):
+        self.vtk_renderer = vtk_renderer
+        self.entries = {}
+        self.requested = set()
+
+    def begin(self):
+        self.requested = set()
+
+    def has(self, vtk_img, value):
+        return (volume_key(vtk_img), value) in self.entries
+
+    def request(self, vtk_img, value, build, opacity, color):
+        key = (volume_key(vtk_img), value)
+        self.requested.add(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            # The volume is referenced by the entry so its key cannot be reused
+            entry = (build(), vtk_img)
+            self.entries[key] = entry
+        actor = entry[0]
+        # Volumes carry their own transfer functions
+        if opacity is not None:
+            actor.GetProperty().SetOpacity(opacity)
+        if color is not None:
+            actor.GetProperty().SetColor(color[0], color[1], color[2])
+        return actor
+
+    def commit(self, live_volumes):
+        live_keys = set(volume_key(v) for v in live_volumes if v is not None)
+        for key in list(self.entries):
+            if key[0] not in live_keys:
+                self.vtk_renderer.RemoveViewProp(self.entries.pop(key)[0])
+
+        # Drop props added by other views sharing the renderer (e.g. the slice viewer)
+        owned = set(entry[0].__this__ for entry in self.entries.values())
+        props = self.vtk_renderer.GetViewProps()
+        foreign = [props.GetItemAsObject(i) for i in range(props.GetNumberOfItems())]
+        for prop in foreign:
+            if prop.__this__ not in owned:
+                self.vtk_renderer.RemoveViewProp(prop)
+
+        for key, (actor, _) in self.entries.items():
+            if not self.vtk_renderer.HasViewProp(actor):
+                self.vtk_renderer.AddActor(actor)
+            actor.SetVisibility(key in self.requested)
+
+    def clear(self):
+        for actor, _ in self.entries.values():
+            self.vtk_renderer.RemoveViewProp(actor)
+        self.entries = {}
+        self.requested = set()
@@ -0,0 +1,188 @@
+import numpy as np
+
+from utils.vtk_tools import vtk_img_to_numpy
+from utils.confusion import FN
+from utils.configs import SLICE_WINDOW, SLICE_LEVEL, EXPORT_QUEUE_SIZE
+
+# Label values 0-5, as the label radio buttons; larger values are clamped
+LUT_SIZE = 6
+# Overlay codes: label value + LUT_SIZE * confusion code
+OVERLAY_SIZE = LUT_SIZE * (FN + 1)
+
+
+def overlay_lut(colors, alpha):
+    # colors: {value: (r, g, b)}; unlisted values stay transparent
+    rgb = np.zeros((LUT_SIZE, 3), dtype=np.float32)
+    opacity = np.zeros(LUT_SIZE, dtype=np.float32)
+    for value, color in colors.items():
+        rgb[value] = color
+        opacity[value] = alpha
+    return rgb, opacity
+
+
+def overlay_codes(label_array, labels, confusion_array=None, codes=()):
+    # One uint8 code per voxel for the selected labels and confusion codes,
+    # unselected ones count as 0
+    label_table = np.zeros(LUT_SIZE, dtype=np.uint8)
+    label_table[list(labels)] = list(labels)
+    overlay = np.take(label_table, np.clip(label_array, 0, LUT_SIZE - 1).astype(np.intp))
+    if confusion_array is not None and codes:
+        code_table = np.zeros(FN + 1, dtype=np.uint8)
+        code_table[list(codes)] = [LUT_SIZE * code for code in codes]
+        overlay += np.take(code_table, confusion_array)
+    return overlay
+
+
+def overlay_table(label_colors, label_alpha, code_colors, code_alpha):
+    """
+    Colour and opacity of every overlay code, so one lookup gives what the
+    label layer with the prediction layer blended over it would give:
+    opacity 1 - (1 - a)(1 - b), colour (label a (1 - b) + pred b) / opacity.
+    """
+    label_rgb, label_opacity = overlay_lut(label_colors, label_alpha)
+    code_rgb, code_opacity = overlay_lut(code_colors, code_alpha)
+    a, b = np.meshgrid(label_opacity, code_opacity[:FN + 1])
+    opacity = 1 - (1 - a) * (1 - b)
+    rgb = label_rgb[None] * (a * (1 - b))[..., None] + code_rgb[:FN + 1, None] * b[..., None]
+    rgb /= np.maximum(opacity, 1e-6)[..., None]
+    return rgb.reshape(OVERLAY_SIZE, 3), opacity.reshape(OVERLAY_SIZE)
+
+
+class SliceCompositor(object):
+    """
+    Builds slice sweep frames straight from the volume arrays, the same way
+    the slice viewer's image actors layer them: the intensity slice through
+    the window/level, then each overlay blended through its lookup table.
+    No reslicing, rendering or readback, so it also works without OpenGL.
+    Frames are at voxel resolution with rows bottom-up, like a readback;
+    filters() scales them to the video size inside ffmpeg.
+    """
+    def __init__(self, vtk_img, orientation, window=SLICE_WINDOW, level=SLICE_LEVEL):
+        self.orientation = orientation
+        self.array = vtk_img_to_numpy(vtk_img)
+        self.lower = level - window / 2
+        self.scale = 255 / window
+        self.overlays = []
+
+        nx, ny, nz = vtk_img.GetDimensions()
+        sx, sy, sz = vtk_img.GetSpacing()
+        # Slice count and physical width/height of a slice per orientation
+        self.count, self.extent = {
+            0: (nz, (nx * sx, ny * sy)),
+            1: (nx, (nz * sz, ny * sy)),
+            2: (ny, (nx * sx, nz * sz)),
+            }[orientation]
+
+    def add_overlay(self, vtk_img, colors, alpha):
+        self.add_table(vtk_img, *overlay_lut(colors, alpha))
+
+    def add_table(self, vtk_img, rgb, opacity):
+        # rgb in 0-1 and opacity per value, values past the table are clamped
+        self.overlays.append((
+            vtk_img_to_numpy(vtk_img),
+            (np.asarray(rgb, dtype=np.float32) * 255, np.asarray(opacity, dtype=np.float32)[:, None])
+            ))
+
+    def __len__(self):
+        return self.count
+
+    def take(self, array, index):
+        # Same planes as the reslice axes of setup_actor_sv; an array of
+        # indices gives a stack of planes along the first axis
+        if self.orientation == 0:
+            return array[index]
+        if self.orientation == 1:
+            return array[::-1, :, index].T
+        if np.ndim(index):
+            return np.moveaxis(array[:, index, :], 1, 0)
+        return array[:, index, :]
+
+    def frame(self, index):
+        intensity = self.take(self.array, index).astype(np.float32)
+        intensity -= self.lower
+        intensity *= self.scale
+        np.clip(intensity, 0, 255, out=intensity)
+        frame = np.repeat(intensity[..., None], 3, axis=-1)
+        for array, (rgb, opacity) in self.overlays:
+            values = np.clip(self.take(array, index), 0, len(rgb) - 1).astype(np.intp)
+            frame += opacity[values] * (rgb[values] - frame)
+        return frame.astype(np.uint8)
+
+    def frames(self, indices):
+        return self.frame(np.asarray(indices))
+
+    def images(self, indices):
+        # Top-down and with square pixels, as the view shows them
+        images = self.frames(indices)[:, ::-1]
+        height, width = images.shape[1:3]
+        rows = max(1, round(width * self.extent[1] / self.extent[0]))
+        if rows == height:
+            return images
+        return images[:, ((np.arange(rows) + 0.5) * height / rows).astype(np.intp)]
+
+    def filters(self, size, background):
+        # Fit the slice's physical aspect into size, centred on the background
+        return fit_filters(*self.extent, size, background)
+
+
+def fit_filters(width, height, size, background):
+    # ffmpeg filters scaling a width x height frame to fit size, padded with
+    # the background (RGB in 0..1) and kept even for yuv420p
+    scale = min(size[0] / width, size[1] / height)
+    fit_width = max(2, int(width * scale) // 2 * 2)
+    fit_height = max(2, int(height * scale) // 2 * 2)
+    color = "".join(f"{int(round(c * 255)):02x}" for c in background)
+    return [
+        f"scale={fit_width}:{fit_height}:flags=bicubic",
+        f"pad={size[0]}:{size[1]}:(ow-iw)/2:(oh-ih)/2:color=0x{color}",
+        ]
+
+
+class PanelTiler(object):
+    """
+    Lays panels out side by side, each centred in a cell under its title
+    strip, in a ring of preallocated frames. Titles and background are
+    drawn into every slot once, so a frame only copies the panel pixels.
+    Like FrameGrabber, a slot is reused only after the encoder is done
+    with it.
+    """
+    def __init__(self, shapes, headers=None, background=255, slots=EXPORT_QUEUE_SIZE + 2):
+        # shapes: (height, width) per panel; headers: uint8 RGB strips per panel
+        cell_height = max(height for height, _ in shapes)
+        cell_width = max(width for _, width in shapes)
+        header_height = max(header.shape[0] for header in headers) if headers else 0
+        self.background = background
+        self.frames = np.full(
+            (slots, header_height + cell_height, cell_width * len(shapes), 3), background, dtype=np.uint8
+            )
+        self.cells = []
+        for i, (height, width) in enumerate(shapes):
+            left = i * cell_width
+            top = header_height + (cell_height - height) // 2
+            x = left + (cell_width - width) // 2
+            self.cells.append((slice(top, top + height), slice(x, x + width)))
+            if headers:
+                header = headers[i][:, :cell_width]
+                x = left + (cell_width - header.shape[1]) // 2
+                self.frames[:, :header.shape[0], x:x + header.shape[1]] = header
+        self.index = 0
+
+    def frame(self, panels):
+        # Panels are cast to uint8 as they are copied in
+        frame = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        for (rows, cols), panel in zip(self.cells, panels):
+            frame[rows, cols] = panel
+        return frame
+
+    def filters(self, size):
+        # Fit the tiled frame into size, padded with the tiler's background
+        height, width = self.frames.shape[1:3]
+        return fit_filters(width, height, size, (self.background / 255,) * 3)
+
+    def stack(self, panel_stacks):
+        # Many frames at once into a new array, one stack of panels per cell
+        frames = np.repeat(self.frames[:1], len(panel_stacks[0]), axis=0)
+        for (rows, cols), panels in zip(self.cells, panel_stacks):
+            frames[:, rows, cols] = panels
+        return frames
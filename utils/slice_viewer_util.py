@@ -2,27 +2,34 @@ import os
 import numpy as np
 import SimpleITK as sitk
 from PySide6.QtCore import Qt, QRect, QSize
-from PySide6.QtGui import QCursor, QPixmap, QIcon
+from PySide6.QtGui import QCursor, QPixmap, QIcon, QImage, QPainter
 from PySide6.QtWidgets import (
-    QApplication, QComboBox, QLabel, QPushButton,
+    QComboBox, QLabel, QPushButton,
     QRadioButton, QSizePolicy, QSlider, QSpinBox,
-    QVBoxLayout, QWidget, QFileDialog, QHBoxLayout
+    QVBoxLayout, QWidget, QFileDialog, QHBoxLayout, QCheckBox
     )
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.animation import FuncAnimation
 from matplotlib.widgets import Button
 from matplotlib.patches import Rectangle
 import matplotlib.pyplot as plt
 from windows.message_box import show_error_message
+from utils.frame_pipeline import FrameEncoder
+from utils.video_export import encode_videos
+from utils.load_service import get_load_service, LoadCancelled
+from utils.slice_frames import PanelTiler
+from utils.snapshots import export_snapshots, ORIENTATION_NAMES, SNAPSHOT_MODES
+from utils.configs import TITLE_HEIGHT, EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE, VIDEO_EXTENSIONS
 
 
 class MultiImgSliceViewer(QWidget):
-    def __init__(self, data_list, label_list, colors):
+    def __init__(self, data_list, label_list, colors, titles=None):
         super().__init__()
         self.data_list = data_list
         self.label_list = label_list
+        self.titles = titles or [f"Image {i + 1}" for i in range(len(data_list))]
         self.labeled_image_list = []
         self.colors = colors
+        self.load_service = get_load_service()
 
         self.num_plots = len(data_list)
         self.num_rows = 1 
@@ -63,7 +70,7 @@ class MultiImgSliceViewer(QWidget):
         self.savePNG_pushButton.setObjectName(u"savePNG_pushButton")
         self.savePNG_pushButton.setGeometry(QRect(240, 140, 113, 32))
         self.savePNG_pushButton.setEnabled(False)
-        self.saveMP4_pushButton = QPushButton("Save MP4", self.panel_widget)
+        self.saveMP4_pushButton = QPushButton("Save Video", self.panel_widget)
         self.saveMP4_pushButton.setObjectName(u"saveMP4_pushButton")
         self.saveMP4_pushButton.setGeometry(QRect(360, 140, 113, 32))
         self.saveMP4_pushButton.setEnabled(False)
@@ -125,6 +132,36 @@ class MultiImgSliceViewer(QWidget):
         self.op_spinBox.setMaximum(40)
         self.op_spinBox.setValue(20)
         self.op_spinBox.setEnabled(False)
+        self.video_comboBox = QComboBox(self.panel_widget)
+        self.video_comboBox.addItem("side by side")
+        self.video_comboBox.addItem("per panel")
+        self.video_comboBox.setObjectName(u"video_comboBox")
+        self.video_comboBox.setGeometry(QRect(370, 40, 101, 26))
+        self.export_comboBox = QComboBox(self.panel_widget)
+        for profile in EXPORT_PROFILES:
+            self.export_comboBox.addItem(profile)
+        self.export_comboBox.setCurrentText(DEFAULT_EXPORT_PROFILE)
+        self.export_comboBox.setObjectName(u"export_comboBox")
+        self.export_comboBox.setGeometry(QRect(130, 75, 111, 26))
+        self.title_checkBox = QCheckBox("Titles", self.panel_widget)
+        self.title_checkBox.setObjectName(u"title_checkBox")
+        self.title_checkBox.setGeometry(QRect(380, 10, 81, 20))
+        self.title_checkBox.setChecked(True)
+        self.all_checkBox = QCheckBox("All views", self.panel_widget)
+        self.all_checkBox.setObjectName(u"all_checkBox")
+        self.all_checkBox.setGeometry(QRect(290, 10, 81, 20))
+        self.png_comboBox = QComboBox(self.panel_widget)
+        for mode in SNAPSHOT_MODES:
+            self.png_comboBox.addItem(mode)
+        self.png_comboBox.setObjectName(u"png_comboBox")
+        self.png_comboBox.setGeometry(QRect(250, 75, 111, 26))
+        self.step_spinBox = QSpinBox(self.panel_widget)
+        self.step_spinBox.setObjectName(u"step_spinBox")
+        self.step_spinBox.setGeometry(QRect(370, 76, 101, 24))
+        self.step_spinBox.setPrefix("N = ")
+        self.step_spinBox.setMinimum(1)
+        self.step_spinBox.setMaximum(50)
+        self.step_spinBox.setValue(1)
         self.render_pushButton = QPushButton("Render", self.panel_widget)
         self.render_pushButton.setObjectName(u"render_pushButton")
         self.render_pushButton.setGeometry(QRect(30, 140, 113, 32))
@@ -168,6 +205,7 @@ class MultiImgSliceViewer(QWidget):
             if radio_button.isChecked():
                 selected_label.append(i)
 
+        self.volume_list = []
         self.labeled_image_list = []
         for i, data in enumerate(self.data_list):
             labeled_image = self.labeled_img(
@@ -175,11 +213,8 @@ class MultiImgSliceViewer(QWidget):
                     self.label_list[i],
                     label_value=selected_label,
                     alpha=self.op_spinBox.value() / 100)
-            if self.comboBox.currentIndex() == 1:
-                labeled_image = labeled_image.transpose(2, 1, 0, 3)[:, :, ::-1, :]
-            elif self.comboBox.currentIndex() == 2:
-                labeled_image = labeled_image.transpose(1, 0, 2, 3)[:, ::-1, :, :]
-            self.labeled_image_list.append(labeled_image)
+            self.volume_list.append(labeled_image)
+            self.labeled_image_list.append(self.oriented(labeled_image, self.comboBox.currentIndex()))
 
         self.images = []
         for i, data in enumerate(self.labeled_image_list):
@@ -195,6 +230,14 @@ class MultiImgSliceViewer(QWidget):
                 self.fig.delaxes(self.axes[i])
         self.canvas.draw()
 
+    def oriented(self, labeled_image, orientation):
+        # Views with the slices of the orientation along the first axis
+        if orientation == 1:
+            return labeled_image.transpose(2, 1, 0, 3)[:, :, ::-1, :]
+        elif orientation == 2:
+            return labeled_image.transpose(1, 0, 2, 3)[:, ::-1, :, :]
+        return labeled_image
+
     def normalize(self, matrix):
         min_val = np.min(matrix)
         max_val = np.max(matrix)
@@ -222,51 +265,112 @@ class MultiImgSliceViewer(QWidget):
         self.canvas.draw()
     
     def save_mp4(self):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save MP4 file", "", "MP4 Files (*.mp4)")
+        profile = EXPORT_PROFILES[self.export_comboBox.currentText()]
+        extension = VIDEO_EXTENSIONS[profile["codec"]]
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save video file", "", f"Video Files (*{extension})")
         if file_path:
-            if not file_path.endswith(('.mp4')):
-                file_path = file_path + '.mp4'
-            try:
-                self.saveMP4_pushButton.setEnabled(False)
-
-                def update(slice_idx):
-                    for i, data in enumerate(self.labeled_image_list):
-                        self.images[i].set_data(data[slice_idx, :, :])
-                        ax = self.axes[i] if self.num_plots > 1 else self.axes
-                    return self.images
-                
-                anim = FuncAnimation(
-                    self.fig,
-                    update,
-                    frames=range(0, self.data_list[0].shape[0]),
-                    interval=200,
-                    blit=True
-                    )
-                anim.save(file_path, writer='ffmpeg', fps=30)
-            except Exception as e:
-                show_error_message(f"Error saving MP4: {e}")
-            finally:
-                self.saveMP4_pushButton.setEnabled(True)
+            if not file_path.endswith(extension):
+                file_path = file_path + extension
+            self.saveMP4_pushButton.setEnabled(False)
+
+            # Frames are tiled from the slices already shown, no figure redraws
+            volumes = list(self.labeled_image_list)
+            panels = list(range(len(volumes)))
+            if self.video_comboBox.currentIndex() == 1:
+                root, ext = os.path.splitext(file_path)
+                outputs = [(f"{root}_{i + 1}{ext}", [i]) for i in panels]
+            else:
+                outputs = [(file_path, panels)]
+            tilers = []
+            for path, indices in outputs:
+                shapes = [volumes[i].shape[1:3] for i in indices]
+                headers = None
+                if self.title_checkBox.isChecked():
+                    headers = [self.title_strip(self.titles[i], shape[1]) for i, shape in zip(indices, shapes)]
+                tilers.append((path, PanelTiler(shapes, headers), indices))
+            count = volumes[0].shape[0]
+
+            # Written on the worker pool, the viewer stays usable meanwhile
+            def frames(tiler, indices):
+                for slice_idx in range(count):
+                    yield tiler.frame([volumes[i][slice_idx] * 255 for i in indices])
+            self.load_service.submit(
+                f"msvw.export.{id(self)}", f"Saving {os.path.basename(file_path)}",
+                lambda progress, cancelled: encode_videos(
+                    # Rows are top-down already, as imshow draws them
+                    [(
+                        FrameEncoder.from_profile(path, profile, flip=False, filters=tiler.filters(profile["size"])),
+                        frames(tiler, indices)
+                    ) for path, tiler, indices in tilers],
+                    count, progress, cancelled
+                    ),
+                self.video_saved, self.video_failed
+                )
+
+    def video_saved(self, file_paths):
+        self.saveMP4_pushButton.setEnabled(True)
+
+    def video_failed(self, error):
+        self.saveMP4_pushButton.setEnabled(True)
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error saving MP4: {error}")
+
+    def title_strip(self, text, width, height=TITLE_HEIGHT):
+        image = QImage(width, height, QImage.Format_RGB888)
+        image.fill(Qt.white)
+        painter = QPainter(image)
+        text = painter.fontMetrics().elidedText(text, Qt.ElideMiddle, width - 4)
+        painter.drawText(QRect(0, 0, width, height), Qt.AlignCenter, text)
+        painter.end()
+        rows = np.frombuffer(image.constBits(), dtype=np.uint8).reshape(height, image.bytesPerLine())
+        return rows[:, :width * 3].reshape(height, width, 3).copy()
 
     def save_png(self):
         file_path, _ = QFileDialog.getSaveFileName(self, "Save PNG file", "", "PNG Files (*.png)")
         if file_path:
             if not file_path.endswith('.png'):
                 file_path = file_path + '.png'
-            try:
-                self.savePNG_pushButton.setEnabled(False)
+            self.savePNG_pushButton.setEnabled(False)
+            # Panels side by side as in the side by side video, tiled from the slices already shown
+            if self.png_comboBox.currentIndex() == 0:
                 slice_idx = self.slice_horizontalSlider.value() - 1
-                fig, ax = plt.subplots(figsize=(6, 6))
-                ax.axis("off")
-                for i, data in enumerate(self.labeled_image_list):
-                    ax.imshow(data[slice_idx, :, :])
-                fig.savefig(file_path, bbox_inches='tight', pad_inches=0, dpi=300)
-                plt.close(fig)
-
-            except Exception as e:
-                show_error_message(f"Error saving PNG: {e}")
-            finally:
-                self.savePNG_pushButton.setEnabled(True)
+                views = [("", [slice_idx], self.snapshot_tiles(self.labeled_image_list))]
+                sheet = True
+            else:
+                orientations = range(3) if self.all_checkBox.isChecked() else [self.comboBox.currentIndex()]
+                views = []
+                for orientation in orientations:
+                    volumes = [self.oriented(volume, orientation) for volume in self.volume_list]
+                    indices = range(0, volumes[0].shape[0], self.step_spinBox.value())
+                    views.append((ORIENTATION_NAMES[orientation], indices, self.snapshot_tiles(volumes)))
+                sheet = self.png_comboBox.currentIndex() == 2
+            self.load_service.submit(
+                f"msvw.png.{id(self)}", f"Saving {os.path.basename(file_path)}",
+                lambda progress, cancelled: export_snapshots(
+                    file_path, views, sheet=sheet, progress=progress, cancelled=cancelled
+                    ),
+                self.pngs_saved, self.pngs_failed
+                )
+
+    def pngs_saved(self, file_paths):
+        self.savePNG_pushButton.setEnabled(True)
+
+    def pngs_failed(self, error):
+        self.savePNG_pushButton.setEnabled(True)
+        if not isinstance(error, LoadCancelled):
+            show_error_message(f"Error saving PNG: {error}")
+
+    def snapshot_tiles(self, volumes):
+        # The slices at indices of all panels, tiled into uint8 images
+        shapes = [volume.shape[1:3] for volume in volumes]
+        headers = None
+        if self.title_checkBox.isChecked():
+            headers = [self.title_strip(title, shape[1]) for title, shape in zip(self.titles, shapes)]
+        tiler = PanelTiler(shapes, headers, slots=1)
+
+        def tiles(indices):
+            return tiler.stack([volume[indices] * 255 for volume in volumes])
+        return tiles
 
 class OmnidirectionalSliceViewer(QWidget):
     def __init__(self, data, pred, colors):
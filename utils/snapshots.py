@@ -0,0 +1,98 @@
+import os
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import imageio.v2 as imageio
+
+from utils.configs import SNAPSHOT_WORKERS, SNAPSHOT_BATCH, SNAPSHOT_COMPRESS_LEVEL
+from utils.volume_store import LoadCancelled
+
+ORIENTATION_NAMES = ["axial", "sagittal", "coronal"]
+SNAPSHOT_MODES = ["current slice", "every Nth slice", "contact sheet"]
+
+
+def contact_sheet(tiles, columns=None, background=255):
+    # tiles: (n, height, width, 3) uint8, laid out row by row in a near-square
+    # grid; background is a gray level or an RGB triple
+    count, height, width = tiles.shape[:3]
+    columns = columns or math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    sheet = np.full((rows * columns, height, width, 3), background, dtype=np.uint8)
+    sheet[:count] = tiles
+    return sheet.reshape(rows, columns, height, width, 3).swapaxes(1, 2).reshape(rows * height, columns * width, 3)
+
+
+class SnapshotWriter(object):
+    """
+    PNG files compressed and written by a small thread pool while the next
+    slices are composited. close() waits for them and raises the first
+    error; abort() drops what is pending and removes what was written.
+    """
+    def __init__(self, workers=SNAPSHOT_WORKERS):
+        self.executor = ThreadPoolExecutor(workers)
+        self.futures = []
+        self.paths = []
+
+    def put(self, path, image):
+        self.paths.append(path)
+        self.futures.append(self.executor.submit(
+            imageio.imwrite, path, image, compress_level=SNAPSHOT_COMPRESS_LEVEL
+            ))
+
+    def close(self):
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.executor.shutdown()
+
+    def abort(self):
+        for future in self.futures:
+            future.cancel()
+        self.executor.shutdown()
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def export_snapshots(file_path, views, sheet=False, background=255, workers=SNAPSHOT_WORKERS,
+                     progress=None, cancelled=None):
+    """
+    Writes the given slices of each view, as one PNG per slice or as one
+    contact sheet per view. views: (name, slice indices, tiles) where
+    tiles(indices) returns those slices as top-down uint8 RGB images.
+    Files are named after file_path, with the view name when there are
+    several views and the 1-based slice number for single slices.
+    background fills the unused cells of a sheet. progress and cancelled
+    are the LoadService job arguments; once cancelled the written files
+    are removed.
+    """
+    root, ext = os.path.splitext(file_path)
+    writer = SnapshotWriter(workers)
+    views = [(name, list(indices), tiles) for name, indices, tiles in views]
+    total = sum(len(indices) for _, indices, _ in views)
+    done = 0
+    try:
+        for name, indices, tiles in views:
+            view_root = f"{root}_{name}" if len(views) > 1 else root
+            batches = [indices[i:i + SNAPSHOT_BATCH] for i in range(0, len(indices), SNAPSHOT_BATCH)]
+            images = []
+            for batch in batches:
+                if cancelled is not None and cancelled():
+                    raise LoadCancelled()
+                if sheet:
+                    images.append(tiles(batch))
+                else:
+                    for index, image in zip(batch, tiles(batch)):
+                        writer.put(f"{view_root}_{index + 1:03d}{ext}", image)
+                done += len(batch)
+                if progress is not None:
+                    progress(done / total)
+            if sheet:
+                writer.put(view_root + ext, contact_sheet(np.concatenate(images), background=background))
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.paths
@@ -0,0 +1,67 @@
+import zlib
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtGui import QImage
+
+from utils.vtk_tools import set_camera
+from utils.frame_pipeline import ExportWindow, FrameGrabber
+from utils.configs import TURNTABLE_FRAMES
+from utils.qt_signals import emit
+
+
+class TurntableSprite(QObject):
+    """
+    The camera path of the 3D export, pre-rendered offscreen into
+    zlib-compressed frames from detached copies of the view's props, so
+    it never draws through the on-screen mappers. One frame is rendered
+    per pass of the event loop, so the UI stays responsive. Frame i is
+    (i + 1) steps round, as in save_mp4.
+    """
+    progress = Signal(int)      # frames rendered
+    finished = Signal()
+
+    def __init__(self, vtk_renderer, size, frames=TURNTABLE_FRAMES, parent=None):
+        super().__init__(parent)
+        self.frames = frames
+        self.sprites = []
+        self.shape = None
+        self.export_window = ExportWindow(vtk_renderer, size, detached=True)
+        set_camera(self.export_window.vtk_renderer)
+        self.camera = self.export_window.vtk_renderer.GetActiveCamera()
+        self.grabber = FrameGrabber(self.export_window.vtk_render_window, slots=1)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.render_next)
+        self.timer.start(0)
+
+    def render_next(self):
+        self.camera.Azimuth(360 / self.frames)
+        self.export_window.vtk_render_window.Render()
+        frame = self.grabber.grab()
+        self.shape = frame.shape
+        # Stored top-down, as QImage expects
+        self.sprites.append(zlib.compress(frame[::-1].tobytes(), 1))
+        emit(self.progress, len(self.sprites))
+        if self.is_complete():
+            self.stop()
+            emit(self.finished)
+
+    def is_complete(self):
+        return len(self.sprites) == self.frames
+
+    def stop(self):
+        self.timer.stop()
+        if self.export_window is not None:
+            self.export_window.close()
+            self.export_window = None
+
+    def index(self, angle):
+        return (round(angle * self.frames / 360) - 1) % self.frames
+
+    def image(self, angle):
+        # Frame nearest to angle degrees, or None if it is not rendered yet
+        index = self.index(angle)
+        if index >= len(self.sprites):
+            return None
+        height, width = self.shape[:2]
+        data = zlib.decompress(self.sprites[index])
+        return QImage(data, width, height, width * 3, QImage.Format_RGB888).copy()
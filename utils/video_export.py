@@ -0,0 +1,102 @@
+import os
+import queue
+import threading
+
+from PySide6.QtCore import QObject, QTimer
+
+from utils.vtk_tools import set_camera
+from utils.volume_store import LoadCancelled
+from utils.frame_pipeline import ExportWindow, FrameGrabber
+from utils.configs import EXPORT_QUEUE_SIZE, EXPORT_POLL_INTERVAL
+
+
+def encode_videos(outputs, count, progress, cancelled):
+    """
+    LoadService job body: feeds count frames to each (encoder, frames) pair
+    and closes the encoders. When cancelled or on any error the encoders
+    are aborted and their partial files removed.
+    """
+    encoders = [encoder for encoder, _ in outputs]
+    try:
+        for i, frames in enumerate(zip(*[frames for _, frames in outputs])):
+            if cancelled():
+                raise LoadCancelled()
+            for encoder, frame in zip(encoders, frames):
+                encoder.put(frame)
+            progress((i + 1) / count)
+        for encoder in encoders:
+            encoder.close()
+    except BaseException:
+        for encoder in encoders:
+            encoder.abort()
+            if os.path.exists(encoder.file_path):
+                os.remove(encoder.file_path)
+        raise
+    return [encoder.file_path for encoder in encoders]
+
+
+class RotationFrames(QObject):
+    """
+    The 3D export's turn of the camera, rendered from copies of the view's
+    props so the view stays editable meanwhile. VTK renders only on the
+    thread owning its OpenGL context, so one frame is rendered per pass of
+    the event loop into a bounded queue, and frames() hands them to the
+    encoding job on the thread pool. Rendering pauses while the queue is
+    full and stops at the last frame or on stop().
+    """
+    def __init__(self, vtk_renderer, size, count, parent=None):
+        super().__init__(parent)
+        self.count = count
+        self.rendered = 0
+        self.queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self.stopped = threading.Event()
+        self.export_window = ExportWindow(vtk_renderer, size, detached=True)
+        set_camera(self.export_window.vtk_renderer)
+        self.camera = self.export_window.vtk_renderer.GetActiveCamera()
+        # Slots for this queue, the encoder's and the frame being encoded
+        self.grabber = FrameGrabber(self.export_window.vtk_render_window, slots=2 * EXPORT_QUEUE_SIZE + 2)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.render_next)
+        self.timer.start(0)
+
+    def render_next(self):
+        if self.stopped.is_set():
+            self.stop()
+            return
+        if self.queue.full():
+            self.timer.setInterval(EXPORT_POLL_INTERVAL)
+            return
+        self.timer.setInterval(0)
+        try:
+            self.camera.Azimuth(360 / self.count)
+            self.export_window.vtk_render_window.Render()
+            self.queue.put(self.grabber.grab())
+        except Exception as e:
+            self.queue.put(e)
+            self.stop()
+            return
+        self.rendered += 1
+        if self.rendered == self.count:
+            self.stop()
+
+    def frames(self, cancelled):
+        # Runs on the encoding thread
+        for _ in range(self.count):
+            while True:
+                try:
+                    frame = self.queue.get(timeout=EXPORT_POLL_INTERVAL / 1000)
+                    break
+                except queue.Empty:
+                    if cancelled() or self.stopped.is_set():
+                        raise LoadCancelled()
+            if isinstance(frame, Exception):
+                raise frame
+            yield frame
+
+    def stop(self):
+        # GUI thread only, the export window is released here
+        self.stopped.set()
+        self.timer.stop()
+        if self.export_window is not None:
+            self.export_window.close()
+            self.export_window = None
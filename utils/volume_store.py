@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+
+import vtk
+import vtkmodules.util.numpy_support as vtkutil
+
+from utils.configs import VOLUME_STORE_MAX_BYTES
+from utils.nifti_mmap import map_nifti
+from utils.derived_cache import set_source_key
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class VolumeEntry(object):
+    def __init__(self, key, vtk_img, qfac=1.0, mapped=False):
+        self.key = key
+        self.vtk_img = vtk_img
+        self.qfac = qfac
+        self.mapped = mapped
+        # Memory-mapped volumes only occupy reclaimable page cache
+        if mapped:
+            self.nbytes = 0
+        else:
+            self.nbytes = vtkutil.vtk_to_numpy(vtk_img.GetPointData().GetScalars()).nbytes
+
+    def vtk_view(self):
+        # Shallow copy: new vtkImageData object, same scalar buffer
+        view = vtk.vtkImageData()
+        view.ShallowCopy(self.vtk_img)
+        return view
+
+    def array_view(self, itk_order=False):
+        dims = self.vtk_img.GetDimensions()
+        array = vtkutil.vtk_to_numpy(self.vtk_img.GetPointData().GetScalars())
+        array = array.reshape(dims[2], dims[1], dims[0])
+        # vtkNIFTIImageReader reverses the slices when qfac is -1, SimpleITK does not
+        if itk_order and self.qfac < 0:
+            array = array[::-1]
+        array.flags.writeable = False
+        return array
+
+
+class VolumeStore(object):
+    """
+    Process-wide cache of decoded NIfTI volumes shared by every tab.
+    Entries are keyed by (path, mtime, size) and evicted LRU once the
+    decoded scalars exceed max_bytes.
+    """
+    def __init__(self, max_bytes=VOLUME_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+
+    def file_key(self, file_name):
+        stat = os.stat(file_name)
+        return (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_name, progress=None, cancelled=None):
+        key = self.file_key(file_name)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+        entry = self.decode(key, file_name, progress, cancelled)
+
+        with self.lock:
+            # Another thread may have decoded the same file meanwhile
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.discard_path(key[0])
+            self.entries[key] = entry
+            self.total_bytes += entry.nbytes
+            self.evict()
+        return entry
+
+    def decode(self, key, file_name, progress=None, cancelled=None):
+        if file_name.endswith('.nii'):
+            mapped = map_nifti(file_name)
+            if mapped is not None:
+                if progress is not None:
+                    progress(1.0)
+                set_source_key(mapped[0], "|".join(map(str, key)))
+                return VolumeEntry(key, mapped[0], mapped[1], mapped=True)
+
+        reader = vtk.vtkNIFTIImageReader()
+        reader.SetFileName(file_name)
+        if progress is not None or cancelled is not None:
+            def on_progress(obj, event):
+                if progress is not None:
+                    progress(obj.GetProgress())
+                if cancelled is not None and cancelled():
+                    obj.SetAbortExecute(1)
+            reader.AddObserver("ProgressEvent", on_progress)
+        reader.Update()
+        if reader.GetAbortExecute():
+            raise LoadCancelled()
+        vtk_img = vtk.vtkImageData()
+        vtk_img.ShallowCopy(reader.GetOutput())
+        set_source_key(vtk_img, "|".join(map(str, key)))
+        return VolumeEntry(key, vtk_img, reader.GetQFac())
+
+    def get_vtk(self, file_name, progress=None, cancelled=None):
+        return self.get(file_name, progress, cancelled).vtk_view()
+
+    def get_array(self, file_name, itk_order=False, progress=None, cancelled=None):
+        return self.get(file_name, progress, cancelled).array_view(itk_order)
+
+    def discard_path(self, path):
+        # Drop stale entries of a file that changed on disk
+        for key in [k for k in self.entries if k[0] == path]:
+            self.total_bytes -= self.entries.pop(key).nbytes
+
+    def evict(self):
+        # The most recently used entry is always kept, even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            self.total_bytes -= self.entries.pop(key).nbytes
+
+    def set_max_bytes(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+volume_store = VolumeStore()
@@ -0,0 +1,10 @@
+import numpy as np
+import vtkmodules.util.numpy_support as vtkutil
+
+def numpy_to_vtk_array(np_array):
+    np_array = np.ascontiguousarray(np_array).reshape(-1)
+    if np_array.dtype == np.bool_:
+        np_array = np_array.view(np.uint8)
+    # Not copied: numpy_to_vtk keeps np_array as the VTK array's _numpy_reference,
+    # so the buffer lives exactly as long as the returned array
+    return vtkutil.numpy_to_vtk(np_array, deep=False)
@@ -3,23 +3,54 @@ import vtk
 import numpy as np
 import vtkmodules.util.numpy_support as vtkutil
 
+from utils.volume_store import volume_store
+from utils.vtk_bridge import numpy_to_vtk_array
+from utils.derived_cache import derived_cache, get_source_key
+from utils.label_index import label_index_cache
+from utils.configs import (
+    SURFACE_PRESETS, DEFAULT_SURFACE_PRESET, LOD_MIN_TRIANGLES, LOD_DIVISIONS, SLICE_WINDOW, SLICE_LEVEL
+)
+
+def quiet_vtk_logging():
+    # vtkSurfaceNets3D logs every extraction at INFO level; called once per
+    # process by the entry points and the batch worker initializer
+    vtk.vtkLogger.SetStderrVerbosity(vtk.vtkLogger.VERBOSITY_WARNING)
+
 def check_files(file):
     if os.path.exists(file):
         return 1
     else:
         return 0
 
-def check_label(label, label_value):
-    if label_value in label:
-        return 0
-    else:
-        return 1
-    
-def load_image(file_name):
-    reader = vtk.vtkNIFTIImageReader()
-    reader.SetFileName(file_name)
-    reader.Update()
-    return reader.GetOutput()
+def load_image(file_name, progress=None, cancelled=None):
+    return volume_store.get_vtk(file_name, progress, cancelled)
+
+def load_array(file_name, progress=None, cancelled=None):
+    # Same voxel order as sitk.GetArrayFromImage, shared with load_image
+    return volume_store.get_array(file_name, True, progress, cancelled)
+
+def load_normalized(file_name, progress=None, cancelled=None):
+    entry = volume_store.get(file_name, progress, cancelled)
+    normalized = normalized_volume(entry.vtk_img)
+    # Same voxel order as sitk.GetArrayFromImage
+    return normalized[::-1] if entry.qfac < 0 else normalized
+
+def normalized_volume(vtk_img):
+    # Min-max normalized to uint8, cached on disk per source file
+    def build():
+        np_img = vtk_img_to_numpy(vtk_img)
+        min_val, max_val = float(np_img.min()), float(np_img.max())
+        scale = 255.0 / (max_val - min_val) if max_val > min_val else 0.0
+        normalized = np.empty(np_img.shape, dtype=np.uint8)
+        for z in range(np_img.shape[0]):
+            normalized[z] = np.rint((np_img[z].astype(np.float32) - min_val) * scale)
+        return normalized
+    return derived_cache.array("normalized", [get_source_key(vtk_img)], None, build)
+
+def load_label(file_name, progress=None, cancelled=None):
+    label_image_vtk = load_image(file_name, progress, cancelled)
+    label_image = vtk_img_to_numpy(label_image_vtk)
+    return label_image_vtk, label_image, int(label_image.max())
 
 def vtk_img_to_numpy(vtk_img):
     dims = vtk_img.GetDimensions()
@@ -30,11 +61,8 @@ def vtk_img_to_numpy(vtk_img):
 
 def numpy_to_vtk_img(np_array, reference_vtk_img):
     vtk_img = vtk.vtkImageData()
-    vtk_img.DeepCopy(reference_vtk_img)  # Copy spatial info (dimensions, spacing, origin, etc.)
-    
-    vtk_data_array = vtkutil.numpy_to_vtk(np_array.ravel(), deep=True, array_type=vtk.VTK_UNSIGNED_CHAR)
-    vtk_img.GetPointData().SetScalars(vtk_data_array)
-    
+    vtk_img.CopyStructure(reference_vtk_img)  # Copy spatial info only (extent, spacing, origin, direction)
+    vtk_img.GetPointData().SetScalars(numpy_to_vtk_array(np_array))
     return vtk_img
 
 def create_contour(vtk_img, label_value=None):
@@ -46,12 +74,28 @@ def create_contour(vtk_img, label_value=None):
         contour.SetValue(0, label_value)
     return contour
 
-def create_smoother(contour):
-    smoother = vtk.vtkSmoothPolyDataFilter()
+def create_smoother(contour, iterations=20, pass_band=0.05):
+    smoother = vtk.vtkWindowedSincPolyDataFilter()
     smoother.SetInputConnection(contour.GetOutputPort())
-    smoother.SetNumberOfIterations(500)
+    smoother.SetNumberOfIterations(iterations)
+    smoother.SetPassBand(pass_band)
+    smoother.BoundarySmoothingOff()
+    smoother.FeatureEdgeSmoothingOff()
+    smoother.NonManifoldSmoothingOn()
+    smoother.NormalizeCoordinatesOn()
     return smoother
 
+def create_decimation(smoother, target_triangles=None):
+    # Passes the mesh through unchanged when it is within the triangle budget
+    smoother.Update()
+    triangles = smoother.GetOutput().GetNumberOfPolys()
+    if target_triangles is None or triangles <= target_triangles:
+        return smoother
+    decimation = vtk.vtkQuadricDecimation()
+    decimation.SetInputConnection(smoother.GetOutputPort())
+    decimation.SetTargetReduction(1.0 - target_triangles / triangles)
+    return decimation
+
 
 def create_normals(smoother):
     brain_normals = vtk.vtkPolyDataNormals()
@@ -60,9 +104,9 @@ def create_normals(smoother):
     return brain_normals
 
 
-def create_mapper(normals):
+def create_mapper(surface):
     brain_mapper = vtk.vtkPolyDataMapper()
-    brain_mapper.SetInputConnection(normals.GetOutputPort())
+    brain_mapper.SetInputData(surface)
     brain_mapper.ScalarVisibilityOff()
     brain_mapper.Update()
     return brain_mapper
@@ -80,16 +124,183 @@ def create_actor(mapper, prop):
     actor.SetProperty(prop)
     return actor
 
-def setup_actor(img, opacity=0.3, color=(1.0,0.9,0.9), label_value=None):
-    # img = reader(file_name)
+def crop_to_extent(vtk_img, extent):
+    # The sub-volume keeps origin and spacing, so surfaces come out in world coordinates
+    whole = vtk_img.GetExtent()
+    voi = vtk.vtkExtractVOI()
+    voi.SetInputData(vtk_img)
+    voi.SetVOI(*[e + whole[2 * (i // 2)] for i, e in enumerate(extent)])
+    voi.Update()
+    return voi.GetOutput()
+
+def shrink_volume(vtk_img, factor):
+    # Nearest-voxel subsampling keeps label values intact
+    shrink = vtk.vtkImageShrink3D()
+    shrink.SetInputData(vtk_img)
+    shrink.SetShrinkFactors(factor, factor, factor)
+    shrink.AveragingOff()
+    shrink.Update()
+    return shrink.GetOutput()
+
+def create_surface(img, label_value=None, preset=DEFAULT_SURFACE_PRESET):
+    # Only the bounding box of the label (or of the non-zero bricks) is contoured
+    extent = label_index_cache.get(img).extent(None if label_value is None else [label_value])
+    if extent is None:
+        return vtk.vtkPolyData()
+    quality = SURFACE_PRESETS[preset]
+    img = crop_to_extent(img, extent)
+    if quality["shrink_factor"] > 1:
+        img = shrink_volume(img, quality["shrink_factor"])
     contour = create_contour(img, label_value)
-    smoother = create_smoother(contour)
-    normals = create_normals(smoother)
-    actor_mapper = create_mapper(normals)
+    smoother = create_smoother(contour, quality["iterations"], quality["pass_band"])
+    decimation = create_decimation(smoother, quality["target_triangles"])
+    normals = create_normals(decimation)
+    normals.Update()
+    return normals.GetOutput()
+
+def setup_surface_actor(surface, opacity=0.3, color=(1.0,0.9,0.9)):
+    actor_mapper = create_mapper(surface)
     actor_property = create_property(opacity, color)
     actor = create_actor(actor_mapper, actor_property)
     return actor
 
+def surface_levels(surface, divisions=LOD_DIVISIONS):
+    # Full mesh first, then coarser quadric-clustered copies for interaction
+    levels = [surface]
+    if surface.GetNumberOfPolys() <= LOD_MIN_TRIANGLES:
+        return levels
+    for division in divisions:
+        clustering = vtk.vtkQuadricClustering()
+        clustering.SetInputData(surface)
+        clustering.AutoAdjustNumberOfDivisionsOff()
+        clustering.SetNumberOfDivisions(division, division, division)
+        clustering.UseInputPointsOn()
+        normals = vtk.vtkPolyDataNormals()
+        normals.SetInputConnection(clustering.GetOutputPort())
+        normals.SetFeatureAngle(60.0)
+        normals.Update()
+        levels.append(normals.GetOutput())
+    return levels
+
+def setup_lod_actor(levels, opacity=0.3, color=(1.0,0.9,0.9)):
+    if len(levels) == 1:
+        return setup_surface_actor(levels[0], opacity, color)
+    # vtkLODActor picks the finest level that fits the allocated render time
+    actor = vtk.vtkLODActor()
+    actor.SetMapper(create_mapper(levels[0]))
+    for level in levels[1:]:
+        actor.AddLODMapper(create_mapper(level))
+    actor.SetProperty(create_property(opacity, color))
+    return actor
+
+def setup_volume(vtk_img, threshold=0.1, opacity=0.02, color=(1.0,0.9,0.9)):
+    # Direct CPU ray casting of the intensities, no surface extraction
+    mapper = vtk.vtkFixedPointVolumeRayCastMapper()
+    mapper.SetInputData(vtk_img)
+    color_function = vtk.vtkColorTransferFunction()
+    color_function.AddRGBPoint(vtk_img.GetScalarRange()[0], color[0], color[1], color[2])
+    volume_property = vtk.vtkVolumeProperty()
+    volume_property.SetColor(color_function)
+    volume_property.SetScalarOpacity(vtk.vtkPiecewiseFunction())
+    volume_property.SetInterpolationTypeToLinear()
+    volume_property.ShadeOff()
+    volume = vtk.vtkVolume()
+    volume.SetMapper(mapper)
+    volume.SetProperty(volume_property)
+    set_volume_opacity(volume, threshold, opacity)
+    return volume
+
+def set_volume_opacity(volume, threshold, opacity):
+    # Transparent below threshold (fraction of the intensity range), then a ramp up to opacity
+    low, high = volume.GetMapper().GetInput().GetScalarRange()
+    opacity_function = volume.GetProperty().GetScalarOpacity()
+    opacity_function.RemoveAllPoints()
+    opacity_function.AddPoint(low, 0.0)
+    opacity_function.AddPoint(low + (high - low) * threshold, 0.0)
+    opacity_function.AddPoint(high, opacity)
+
+def volume_surface(img, label_value=None, preset=DEFAULT_SURFACE_PRESET):
+    return derived_cache.surface(
+        img,
+        dict(SURFACE_PRESETS[preset], preset=preset, label_value=label_value, feature_angle=60.0),
+        lambda: create_surface(img, label_value, preset)
+        )
+
+def setup_actor(img, opacity=0.3, color=(1.0,0.9,0.9), label_value=None, preset=DEFAULT_SURFACE_PRESET):
+    # img = reader(file_name)
+    return setup_surface_actor(volume_surface(img, label_value, preset), opacity, color)
+
+def create_label_surfaces(vtk_img, label_values, iterations=20, target_triangles=None):
+    # One Surface Nets sweep over the union of their bounding boxes extracts
+    # and smooths the boundaries of every label
+    extent = label_index_cache.get(vtk_img).extent(label_values)
+    if extent is None:
+        return {value: vtk.vtkPolyData() for value in label_values}
+    nets = vtk.vtkSurfaceNets3D()
+    nets.SetInputData(crop_to_extent(vtk_img, extent))
+    for i, value in enumerate(label_values):
+        nets.SetLabel(i, value)
+    nets.SetBackgroundLabel(0)
+    nets.SetOutputMeshTypeToTriangles()
+    nets.SmoothingOn()
+    nets.SetNumberOfIterations(iterations)
+    nets.Update()
+    return split_label_surfaces(nets.GetOutput(), label_values, target_triangles)
+
+def split_label_surfaces(surface, label_values, target_triangles=None):
+    surfaces = {}
+    if surface.GetNumberOfCells() == 0:
+        return {value: vtk.vtkPolyData() for value in label_values}
+    boundary = vtkutil.vtk_to_numpy(surface.GetCellData().GetArray("BoundaryLabels"))
+    triangles = vtkutil.vtk_to_numpy(surface.GetPolys().GetConnectivityArray()).reshape(-1, 3)
+    points = vtkutil.vtk_to_numpy(surface.GetPoints().GetData())
+    for value in label_values:
+        selected = triangles[(boundary == value).any(axis=1)]
+        point_ids, connectivity = np.unique(selected, return_inverse=True)
+
+        label_points = vtk.vtkPoints()
+        label_points.SetData(vtkutil.numpy_to_vtk(points[point_ids], deep=True))
+        offsets = np.arange(0, selected.size + 1, 3, dtype=np.int64)
+        cells = vtk.vtkCellArray()
+        cells.SetData(
+            vtkutil.numpy_to_vtkIdTypeArray(offsets, deep=True),
+            vtkutil.numpy_to_vtkIdTypeArray(connectivity.astype(np.int64).ravel(), deep=True)
+            )
+        polydata = vtk.vtkPolyData()
+        polydata.SetPoints(label_points)
+        polydata.SetPolys(cells)
+
+        normals = vtk.vtkPolyDataNormals()
+        if target_triangles is not None and len(selected) > target_triangles:
+            decimation = vtk.vtkQuadricDecimation()
+            decimation.SetInputData(polydata)
+            decimation.SetTargetReduction(1.0 - target_triangles / len(selected))
+            normals.SetInputConnection(decimation.GetOutputPort())
+        else:
+            normals.SetInputData(polydata)
+        normals.SetFeatureAngle(60.0)
+        normals.Update()
+        surfaces[value] = normals.GetOutput()
+    return surfaces
+
+def label_surfaces(vtk_img, label_values, preset=DEFAULT_SURFACE_PRESET):
+    # A label's Surface Nets boundary depends on which other labels are in
+    # the sweep, so the cached surfaces are keyed by the whole label set
+    quality = SURFACE_PRESETS[preset]
+    label_values = sorted(set(label_values))
+    return derived_cache.surfaces(
+        vtk_img,
+        label_values,
+        {
+            "method": "surface_nets", "preset": preset, "iterations": quality["nets_iterations"],
+            "target_triangles": quality["target_triangles"], "feature_angle": 60.0,
+            "labels": label_values
+        },
+        lambda values: create_label_surfaces(
+            vtk_img, values, quality["nets_iterations"], quality["target_triangles"]
+            )
+        )
+
 def creat_reslice(vtk_img, orientation_mat):
     reslice = vtk.vtkImageReslice()
     reslice.SetInputData(vtk_img)
@@ -134,12 +345,10 @@ def setup_actor_sv(vtk_img, orientation):
                         0, 0, 0, 1))
 
     reslice = creat_reslice(vtk_img, matrix)
-    window = 400
-    level = 200
     wl_mapper = vtk.vtkImageMapToWindowLevelColors()
     wl_mapper.SetInputConnection(reslice.GetOutputPort())
-    wl_mapper.SetWindow(window)
-    wl_mapper.SetLevel(level)
+    wl_mapper.SetWindow(SLICE_WINDOW)
+    wl_mapper.SetLevel(SLICE_LEVEL)
     wl_mapper.Update()
 
     actor = vtk.vtkImageActor()
@@ -147,7 +356,7 @@ def setup_actor_sv(vtk_img, orientation):
     
     return reslice, actor
 
-def setup_label_actor_sv(label_image, orientation, selected_labels, colors, alpha):
+def setup_overlay_actor_sv(overlay_image, orientation, lut):
     matrix = vtk.vtkMatrix4x4()
 
     if orientation == 0:        # (XY)
@@ -168,41 +377,31 @@ def setup_label_actor_sv(label_image, orientation, selected_labels, colors, alph
                         0, 1, 0, 0,
                         0, 0, 0, 1))
 
-    label_reslice = vtk.vtkImageReslice()
-    label_reslice.SetInputData(label_image)
-    label_reslice.SetInterpolationModeToNearestNeighbor()
-    label_reslice.SetOutputDimensionality(2)
-    label_reslice.SetResliceAxes(matrix)
-    label_reslice.Update()
-
-    label_map = vtk.vtkImageMapToColors()
-    label_map.SetInputConnection(label_reslice.GetOutputPort())
-    label_map.SetLookupTable(create_label_lut(colors, alpha, selected_labels))
-    label_map.SetOutputFormatToRGBA()
+    overlay_reslice = vtk.vtkImageReslice()
+    overlay_reslice.SetInputData(overlay_image)
+    overlay_reslice.SetInterpolationModeToNearestNeighbor()
+    overlay_reslice.SetOutputDimensionality(2)
+    overlay_reslice.SetResliceAxes(matrix)
+    overlay_reslice.Update()
+
+    overlay_map = vtk.vtkImageMapToColors()
+    overlay_map.SetInputConnection(overlay_reslice.GetOutputPort())
+    overlay_map.SetLookupTable(lut)
+    overlay_map.SetOutputFormatToRGBA()
     
-    label_map.Update()
+    overlay_map.Update()
     actor = vtk.vtkImageActor()
-    actor.GetMapper().SetInputConnection(label_map.GetOutputPort())
-    return label_reslice, actor
+    actor.GetMapper().SetInputConnection(overlay_map.GetOutputPort())
+    return overlay_reslice, actor
 
-def create_label_lut(colors, alpha, selected_labels=None):
+def create_overlay_lut(rgb, opacity):
+    # One entry per overlay value, see utils.slice_frames.overlay_table
     lut = vtk.vtkLookupTable()
-    lut.SetNumberOfColors(6)
-    lut.SetTableRange(0, 6)
+    lut.SetNumberOfColors(len(rgb))
+    lut.SetTableRange(0, len(rgb))
     lut.Build()
-    lut.SetTableValue(0, 0, 0, 0, 0)
-
-    if selected_labels:
-        for i in range(1, 6):
-            if i in selected_labels:
-                r, g, b = colors[i][0], colors[i][1], colors[i][2]
-                lut.SetTableValue(i, r, g, b, alpha)
-            else:
-                lut.SetTableValue(i, 0, 0, 0, 0)
-    else:
-        r, g, b = colors[0], colors[1], colors[2]
-        lut.SetTableValue(1, r, g, b, alpha)
-    
+    for i, (color, alpha) in enumerate(zip(rgb, opacity)):
+        lut.SetTableValue(i, color[0], color[1], color[2], alpha)
     return lut
 
 def set_camera(renderer):
@@ -218,47 +417,3 @@ def set_camera_sv(renderer):
     camera.SetFocalPoint(0, 0, 0)
     camera.SetViewUp(0, 1, 0)
     renderer.ResetCamera()
-
-def AND(vtk_img1, vtk_img2):
-    np_img1 = vtk_img_to_numpy(vtk_img1)
-    np_img2 = vtk_img_to_numpy(vtk_img2)
-    
-    and_result = np.logical_and(np_img1, np_img2).astype(np.uint8)
-    if not np.any(and_result):
-        return None
-    
-    vtk_result_img = numpy_to_vtk_img(and_result, vtk_img1)
-    return vtk_result_img
-
-def XOR(vtk_img1, vtk_img2):
-    np_img1 = vtk_img_to_numpy(vtk_img1)
-    np_img2 = vtk_img_to_numpy(vtk_img2)
-    
-    xor_result = np.logical_xor(np_img1, np_img2).astype(np.uint8)
-    if not np.any(xor_result):
-        return None
-    
-    vtk_result_img = numpy_to_vtk_img(xor_result, vtk_img1)
-    return vtk_result_img
-
-def false_positive(gt_vtk_img, pred_vtk_img):
-    gt_np_img = vtk_img_to_numpy(gt_vtk_img)
-    pred_np_img = vtk_img_to_numpy(pred_vtk_img)
-    
-    false_positive_result = np.logical_and(np.logical_not(gt_np_img), pred_np_img).astype(np.uint8)
-    if not np.any(false_positive_result):
-        return None
-
-    vtk_result_img = numpy_to_vtk_img(false_positive_result, gt_vtk_img)
-    return vtk_result_img
-
-def false_negative(gt_vtk_img, pred_vtk_img):
-    gt_np_img = vtk_img_to_numpy(gt_vtk_img)
-    pred_np_img = vtk_img_to_numpy(pred_vtk_img)
-    
-    false_negative_result = np.logical_and(gt_np_img, np.logical_not(pred_np_img)).astype(np.uint8)
-    if not np.any(false_negative_result):
-        return None
-    
-    vtk_result_img = numpy_to_vtk_img(false_negative_result, gt_vtk_img)
-    return vtk_result_img
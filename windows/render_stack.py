@@ -0,0 +1,55 @@
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QPixmap
+from PySide6.QtWidgets import QStackedWidget, QLabel, QSizePolicy
+
+from utils.qt_signals import emit
+
+
+class ImageView(QLabel):
+    # Mouse input means the user wants the live view back
+    interacted = Signal()
+
+    def __init__(self, live_widget, parent=None):
+        super().__init__(parent)
+        self.live_widget = live_widget
+        self.setAlignment(Qt.AlignCenter)
+        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+
+    # Events are forwarded after the switch so the drag starts right away
+    def mousePressEvent(self, event):
+        emit(self.interacted)
+        self.live_widget.mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        self.live_widget.mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        self.live_widget.mouseReleaseEvent(event)
+
+    def wheelEvent(self, event):
+        emit(self.interacted)
+        self.live_widget.wheelEvent(event)
+
+
+class RenderStack(QStackedWidget):
+    """
+    The VTK widget with a plain image view in front of it, so pre-rendered
+    frames can be shown without rendering anything.
+    """
+    def __init__(self, vtk_widget, parent=None):
+        super().__init__(parent)
+        self.vtk_widget = vtk_widget
+        self.image_view = ImageView(vtk_widget, self)
+        self.addWidget(vtk_widget)
+        self.addWidget(self.image_view)
+
+    def show_image(self, image):
+        image.setDevicePixelRatio(self.devicePixelRatioF())
+        self.image_view.setPixmap(QPixmap.fromImage(image))
+        self.setCurrentWidget(self.image_view)
+
+    def show_live(self):
+        self.setCurrentWidget(self.vtk_widget)
+
+    def showing_image(self):
+        return self.currentWidget() is self.image_view
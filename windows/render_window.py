@@ -1,8 +1,9 @@
-from PySide6.QtCore import QRect
+from PySide6.QtCore import Qt, QRect
 from PySide6.QtWidgets import (
-    QWidget, QSpinBox, QLabel, QPushButton, QRadioButton
+    QWidget, QSpinBox, QLabel, QPushButton, QRadioButton, QComboBox, QCheckBox, QSlider
 )
 from windows.drop_line import DropLineEdit
+from utils.configs import SURFACE_PRESETS, DEFAULT_SURFACE_PRESET, EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE
 
 class Render_Window(object):
     def __init__(self, centralwidget):
@@ -133,11 +134,66 @@ class Render_Window(object):
         self.PO_spinBox.setSingleStep(1)
         self.PO_spinBox.setEnabled(False)
 
+        self.quality_label = QLabel("Quality", self.render_panel)
+        self.quality_label.setObjectName("quality_label")
+        self.quality_label.setGeometry(QRect(20, 360, 91, 21))
+        self.quality_comboBox = QComboBox(self.render_panel)
+        for preset in SURFACE_PRESETS:
+            self.quality_comboBox.addItem(preset)
+        self.quality_comboBox.setCurrentText(DEFAULT_SURFACE_PRESET)
+        self.quality_comboBox.setObjectName("quality_comboBox")
+        self.quality_comboBox.setGeometry(QRect(110, 358, 120, 26))
+
+        self.mode_label = QLabel("Brain Mode", self.render_panel)
+        self.mode_label.setObjectName("mode_label")
+        self.mode_label.setGeometry(QRect(20, 390, 91, 21))
+        self.mode_comboBox = QComboBox(self.render_panel)
+        self.mode_comboBox.addItem("surface")
+        self.mode_comboBox.addItem("volume")
+        self.mode_comboBox.setObjectName("mode_comboBox")
+        self.mode_comboBox.setGeometry(QRect(110, 388, 120, 26))
+
+        self.threshold_label = QLabel("Threshold %", self.render_panel)
+        self.threshold_label.setObjectName("threshold_label")
+        self.threshold_label.setGeometry(QRect(20, 420, 91, 21))
+        self.threshold_spinBox = QSpinBox(self.render_panel)
+        self.threshold_spinBox.setObjectName("threshold_spinBox")
+        self.threshold_spinBox.setGeometry(QRect(110, 420, 61, 24))
+        self.threshold_spinBox.setMinimum(0)
+        self.threshold_spinBox.setMaximum(99)
+        self.threshold_spinBox.setValue(10)
+        self.threshold_spinBox.setSingleStep(1)
+        self.threshold_spinBox.setEnabled(False)
+
+        self.export_label = QLabel("Export", self.render_panel)
+        self.export_label.setObjectName("export_label")
+        self.export_label.setGeometry(QRect(20, 450, 91, 21))
+        self.export_comboBox = QComboBox(self.render_panel)
+        for profile in EXPORT_PROFILES:
+            self.export_comboBox.addItem(profile)
+        self.export_comboBox.setCurrentText(DEFAULT_EXPORT_PROFILE)
+        self.export_comboBox.setObjectName("export_comboBox")
+        self.export_comboBox.setGeometry(QRect(110, 448, 120, 26))
+
+        self.turntable_checkBox = QCheckBox("Turntable", self.render_panel)
+        self.turntable_checkBox.setObjectName("turntable_checkBox")
+        self.turntable_checkBox.setGeometry(QRect(20, 482, 91, 20))
+        self.turntable_checkBox.setEnabled(False)
+        self.angle_horizontalSlider = QSlider(self.render_panel)
+        self.angle_horizontalSlider.setObjectName("angle_horizontalSlider")
+        self.angle_horizontalSlider.setGeometry(QRect(110, 481, 140, 22))
+        self.angle_horizontalSlider.setOrientation(Qt.Horizontal)
+        self.angle_horizontalSlider.setRange(0, 359)
+        self.angle_horizontalSlider.setEnabled(False)
+        self.angle_label = QLabel(self.render_panel)
+        self.angle_label.setObjectName("angle_label")
+        self.angle_label.setGeometry(QRect(258, 482, 50, 21))
+
         self.render_pushButton = QPushButton("Render", self.render_panel)
         self.render_pushButton.setObjectName("render_pushButton")
-        self.render_pushButton.setGeometry(QRect(30, 360, 113, 32))
+        self.render_pushButton.setGeometry(QRect(30, 520, 113, 32))
         self.render_pushButton.setEnabled(False)
-        self.save_pushButton = QPushButton("Save MP4", self.render_panel)
+        self.save_pushButton = QPushButton("Save Video", self.render_panel)
         self.save_pushButton.setObjectName("save_pushButton")
-        self.save_pushButton.setGeometry(QRect(160, 360, 113, 32))
+        self.save_pushButton.setGeometry(QRect(160, 520, 113, 32))
         self.save_pushButton.setEnabled(False)
\ No newline at end of file
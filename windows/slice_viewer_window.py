@@ -1,8 +1,10 @@
 from PySide6.QtCore import QRect, Qt
 from PySide6.QtWidgets import (
-    QWidget, QSpinBox, QLabel, QPushButton, QRadioButton, QSlider, QComboBox
+    QWidget, QSpinBox, QLabel, QPushButton, QRadioButton, QSlider, QComboBox, QCheckBox
 )
 from windows.drop_line import DropLineEdit
+from utils.configs import EXPORT_PROFILES, DEFAULT_EXPORT_PROFILE
+from utils.snapshots import SNAPSHOT_MODES
 
 class SliceViewer_Window(object):
     def __init__(self, centralwidget):
@@ -145,17 +147,46 @@ class SliceViewer_Window(object):
         self.slice_idx_label.setObjectName(u"slice_idx_label")
         self.slice_idx_label.setGeometry(QRect(60, 340, 41, 16))
 
+        self.export_label = QLabel("Export", self.sv_panel)
+        self.export_label.setObjectName(u"export_label")
+        self.export_label.setGeometry(QRect(20, 402, 90, 16))
+        self.export_comboBox = QComboBox(self.sv_panel)
+        for profile in EXPORT_PROFILES:
+            self.export_comboBox.addItem(profile)
+        self.export_comboBox.setCurrentText(DEFAULT_EXPORT_PROFILE)
+        self.export_comboBox.setObjectName(u"export_comboBox")
+        self.export_comboBox.setGeometry(QRect(105, 397, 120, 26))
+
+        self.png_label = QLabel("PNG", self.sv_panel)
+        self.png_label.setObjectName(u"png_label")
+        self.png_label.setGeometry(QRect(20, 437, 90, 16))
+        self.png_comboBox = QComboBox(self.sv_panel)
+        for mode in SNAPSHOT_MODES:
+            self.png_comboBox.addItem(mode)
+        self.png_comboBox.setObjectName(u"png_comboBox")
+        self.png_comboBox.setGeometry(QRect(105, 432, 120, 26))
+        self.step_spinBox = QSpinBox(self.sv_panel)
+        self.step_spinBox.setObjectName(u"step_spinBox")
+        self.step_spinBox.setGeometry(QRect(230, 433, 70, 24))
+        self.step_spinBox.setPrefix("N = ")
+        self.step_spinBox.setMinimum(1)
+        self.step_spinBox.setMaximum(50)
+        self.step_spinBox.setValue(1)
+        self.all_checkBox = QCheckBox("All orientations", self.sv_panel)
+        self.all_checkBox.setObjectName(u"all_checkBox")
+        self.all_checkBox.setGeometry(QRect(105, 463, 150, 20))
+
         self.render_pushButton = QPushButton("Render", self.sv_panel)
         self.render_pushButton.setObjectName("render_pushButton")
-        self.render_pushButton.setGeometry(QRect(95, 430, 113, 32))
+        self.render_pushButton.setGeometry(QRect(95, 500, 113, 32))
         self.render_pushButton.setEnabled(False)
 
         self.savePNG_pushButton = QPushButton("Save PNG", self.sv_panel)
         self.savePNG_pushButton.setObjectName("savePNG_pushButton")
-        self.savePNG_pushButton.setGeometry(QRect(30, 480, 113, 32))
+        self.savePNG_pushButton.setGeometry(QRect(30, 550, 113, 32))
         self.savePNG_pushButton.setEnabled(False)
 
-        self.saveMP4_pushButton = QPushButton("Save MP4", self.sv_panel)
+        self.saveMP4_pushButton = QPushButton("Save Video", self.sv_panel)
         self.saveMP4_pushButton.setObjectName("saveMP4_pushButton")
-        self.saveMP4_pushButton.setGeometry(QRect(160, 480, 113, 32))
+        self.saveMP4_pushButton.setGeometry(QRect(160, 550, 113, 32))
         self.saveMP4_pushButton.setEnabled(False)
\ No newline at end of file